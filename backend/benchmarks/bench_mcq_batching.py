@@ -0,0 +1,79 @@
+"""Compare single-question and batched MCQ generation against an Ollama host.
+
+Run from the backend folder, e.g.:
+
+    python -m benchmarks.bench_mcq_batching --batch-sizes 1 3 5 --questions 15
+
+Reports questions/sec and prompt/completion tokens per accepted question for
+each batch size, using the `prompt_eval_count`/`eval_count` fields of the
+chat responses.
+"""
+import os
+import time
+import json
+import argparse
+from services.async_utils import run_sync
+from services.mcq_generator import ConcurrentMCQGenerator
+from services.text_to_mcq import generation_settings, mcq_model, ollama_host_url
+
+
+def load_chunks(path: str, chunk_size: int = 1000) -> list:
+    """Cut a text file into roughly chunk_size-character pieces on paragraph boundaries."""
+    with open(path, "r", encoding="utf-8") as f:
+        paragraphs = [p.strip() for p in f.read().split("\n\n") if p.strip()]
+    chunks, current = [], ""
+    for paragraph in paragraphs:
+        if current and len(current) + len(paragraph) > chunk_size:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def run_case(chunks: list, num_questions: int, batch_size: int, concurrency: int) -> dict:
+    build_prompt, response_format, validate = generation_settings(batch_size)
+    generator = ConcurrentMCQGenerator(model=mcq_model, host=ollama_host_url, concurrency=concurrency,
+                                       items_per_request=batch_size, response_format=response_format)
+    start = time.perf_counter()
+    mcqs = run_sync(generator.generate(chunks, num_questions, build_prompt=build_prompt, validate=validate))
+    elapsed = time.perf_counter() - start
+    stats = generator.stats
+    accepted = max(len(mcqs), 1)
+    return {
+        "batch_size": batch_size,
+        "questions": len(mcqs),
+        "calls": stats["attempts"],
+        "seconds": round(elapsed, 3),
+        "questions_per_sec": round(len(mcqs) / elapsed, 3) if elapsed else None,
+        "prompt_tokens_per_question": round(stats["prompt_tokens"] / accepted, 1),
+        "completion_tokens_per_question": round(stats["completion_tokens"] / accepted, 1),
+        "invalid": stats["invalid"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--text", default=os.path.join(os.path.dirname(__file__), "..", "data.txt"))
+    parser.add_argument("--questions", type=int, default=12)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--concurrency", type=int, default=1, help="1 isolates prefill cost from parallelism")
+    parser.add_argument("--output", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.text)
+    results = [run_case(chunks, args.questions, k, args.concurrency) for k in args.batch_sizes]
+
+    print(f"\n{'K':>3} {'questions':>9} {'calls':>5} {'q/sec':>8} {'prompt tok/q':>12} {'gen tok/q':>9}")
+    for r in results:
+        print(f"{r['batch_size']:>3} {r['questions']:>9} {r['calls']:>5} {r['questions_per_sec']:>8} "
+              f"{r['prompt_tokens_per_question']:>12} {r['completion_tokens_per_question']:>9}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
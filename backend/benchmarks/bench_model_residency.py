@@ -0,0 +1,98 @@
+"""Measure model load churn with and without the model residency scheduler.
+
+Run from the backend folder, e.g.:
+
+    python -m benchmarks.bench_model_residency --runs 3 --load-latency 0.5
+
+Starts an in-process fake Ollama that only keeps `--max-loaded` models in
+memory and charges `--load-latency` seconds for every load. Several pipeline
+runs are started `--stagger` seconds apart, each with `--concurrency` requests
+in flight, so one run's MCQ stage overlaps the next run's OCR stage, which is
+the situation that makes a real Ollama host swap models back and forth.
+"""
+import time
+import json
+import asyncio
+import argparse
+import contextlib
+from ollama import AsyncClient
+from benchmarks.fake_ollama import FakeOllamaServer
+from services.async_utils import run_sync
+from services.model_scheduler import ModelScheduler
+
+OCR_MODEL = "bench-ocr"
+MCQ_MODEL = "bench-mcq"
+
+
+async def fake_run(client: AsyncClient, scheduler, run_index: int, pages: int, questions: int, stagger: float,
+                   concurrency: int):
+    """One pipeline run: OCR every page, then ask for the questions, `concurrency` requests at a time."""
+    await asyncio.sleep(run_index * stagger)
+    in_flight = asyncio.Semaphore(concurrency)
+
+    async def call(model, request):
+        async with in_flight, (scheduler.ause(model) if scheduler else contextlib.nullcontext()):
+            return await request()
+
+    await asyncio.gather(*[
+        call(OCR_MODEL, lambda p=p: client.generate(model=OCR_MODEL, prompt=f"page {run_index}-{p}"))
+        for p in range(pages)
+    ])
+    await asyncio.gather(*[
+        call(MCQ_MODEL, lambda q=q: client.chat(model=MCQ_MODEL,
+                                                messages=[{"role": "user", "content": f"question {run_index}-{q}"}]))
+        for q in range(questions)
+    ])
+
+
+def run_case(args, use_scheduler: bool) -> dict:
+    with FakeOllamaServer(load_latency=args.load_latency, max_loaded=args.max_loaded,
+                          request_latency=args.request_latency) as server:
+        client = AsyncClient(host=server.url)
+        scheduler = ModelScheduler(max_resident=args.max_loaded) if use_scheduler else None
+
+        async def all_runs():
+            await asyncio.gather(*[
+                fake_run(client, scheduler, i, args.pages, args.questions, args.stagger, args.concurrency)
+                for i in range(args.runs)
+            ])
+
+        start = time.perf_counter()
+        run_sync(all_runs())
+        elapsed = time.perf_counter() - start
+        stats = server.state.stats()
+    return {
+        "scheduler": use_scheduler,
+        "seconds": round(elapsed, 3),
+        "loads": sum(stats["loads"].values()),
+        "unloads": sum(stats["unloads"].values()),
+        "switches": scheduler.stats()["switches"] if scheduler else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=16)
+    parser.add_argument("--questions", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=2, help="Requests in flight per run, like OCR_MAX_IN_FLIGHT")
+    parser.add_argument("--stagger", type=float, default=0.8, help="Seconds between run starts")
+    parser.add_argument("--load-latency", type=float, default=0.5)
+    parser.add_argument("--request-latency", type=float, default=0.1)
+    parser.add_argument("--max-loaded", type=int, default=1)
+    parser.add_argument("--output", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    results = [run_case(args, use_scheduler=False), run_case(args, use_scheduler=True)]
+
+    print(f"\n{'scheduler':>9} {'seconds':>8} {'loads':>5} {'unloads':>7}")
+    for r in results:
+        print(f"{str(r['scheduler']):>9} {r['seconds']:>8} {r['loads']:>5} {r['unloads']:>7}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
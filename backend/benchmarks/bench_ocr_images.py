@@ -0,0 +1,121 @@
+"""Compare OCR payload size, latency and text fidelity across image optimization settings.
+
+Run from the backend folder, e.g.:
+
+    python -m benchmarks.bench_ocr_images --pdf upload/Data.pdf --max-pages 5
+    python -m benchmarks.bench_ocr_images --pages 5 --presets baseline gray-crop budget
+    python -m benchmarks.bench_ocr_images --fake   # plumbing check against the fake Ollama
+
+Every page is rendered with each preset of `ImageOptimizer` settings and read
+by the OCR model configured in `.env` (`OCR_MODEL`, `OLLAMA_HOST_URL`), one
+request at a time. Fidelity is the word-level similarity of the OCR text to
+the page's text layer; pages without one are compared with the "baseline"
+output instead. Without `--pdf` a synthetic PDF with a text layer is used.
+"""
+import os
+import json
+import time
+import difflib
+import argparse
+import tempfile
+import contextlib
+import fitz  # PyMuPDF
+from benchmarks.fake_ollama import FakeOllamaServer
+from benchmarks.synthetic_pdfs import make_pdf
+from services.pdf_to_text import OCR_DPI, OCR_IMAGE_FORMAT, OCR_IMAGE_QUALITY, GemmaOCR
+from services.image_optimizer import ImageOptimizer
+
+MIN_REFERENCE_CHARS = 50  # shorter text layers are not trusted as a reference
+
+PRESETS = {
+    "baseline": {"grayscale": False, "crop_margins": False},
+    "gray": {"grayscale": True, "crop_margins": False},
+    "gray-crop": {"grayscale": True, "crop_margins": True},
+    "adaptive": {"grayscale": True, "crop_margins": True, "adaptive_dpi": True},
+    "budget": {"grayscale": True, "crop_margins": True, "adaptive_dpi": True, "max_pixels": None},
+    "tiles": {"grayscale": True, "crop_margins": True, "adaptive_dpi": True, "max_pixels": None,
+              "tile_dense_pages": True},
+}
+
+
+def similarity(reference: str, text: str) -> float:
+    """Share of matching words between two texts, from 0 to 1."""
+    return difflib.SequenceMatcher(None, reference.lower().split(), text.lower().split(), autojunk=False).ratio()
+
+
+def run_preset(name: str, pages: list, ocr: GemmaOCR, args) -> tuple:
+    """OCR every page with one preset; returns (summary, [text per page])."""
+    settings = {key: args.max_pixels if value is None else value for key, value in PRESETS[name].items()}
+    optimizer = ImageOptimizer(args.dpi, args.image_format, args.image_quality, **settings)
+    texts, image_bytes, images, seconds = [], 0, 0, 0.0
+    for pdf_path, page_num in pages:
+        with fitz.open(pdf_path) as doc:
+            page_images = optimizer.render(doc, page_num)
+        start = time.perf_counter()
+        page_texts = [ocr.extract_text_from_image(image) for image in page_images]
+        seconds += time.perf_counter() - start
+        texts.append("\n".join(text for text in page_texts if text))
+        image_bytes += sum(len(image) for image in page_images)
+        images += len(page_images)
+    return {
+        "preset": name,
+        "variant": optimizer.variant,
+        "kb_per_page": round(image_bytes / len(pages) / 1024, 1),
+        "images_per_page": round(images / len(pages), 2),
+        "seconds_per_page": round(seconds / len(pages), 3),
+    }, texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", nargs="+", help="sample PDFs (default: a synthetic PDF)")
+    parser.add_argument("--pages", type=int, default=3, help="pages of the synthetic PDF")
+    parser.add_argument("--max-pages", type=int, default=10, help="pages used per sample PDF")
+    parser.add_argument("--presets", nargs="+", choices=list(PRESETS), default=list(PRESETS))
+    parser.add_argument("--max-pixels", type=int, default=1_000_000, help="pixel budget of budget/tiles")
+    parser.add_argument("--dpi", type=int, default=OCR_DPI)
+    parser.add_argument("--image-format", default=OCR_IMAGE_FORMAT)
+    parser.add_argument("--image-quality", type=int, default=OCR_IMAGE_QUALITY)
+    parser.add_argument("--fake", action="store_true", help="use a local fake Ollama (sizes only, no real OCR)")
+    parser.add_argument("--output", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="qbot-ocr-images-") as workdir, \
+            (FakeOllamaServer() if args.fake else contextlib.nullcontext()) as server:
+        pdf_paths = args.pdf or [make_pdf(os.path.join(workdir, "synthetic.pdf"), args.pages, "text")]
+        pages, references = [], []
+        for pdf_path in pdf_paths:
+            with fitz.open(pdf_path) as doc:
+                for page_num in range(min(len(doc), args.max_pages)):
+                    text = doc[page_num].get_text().strip()
+                    pages.append((pdf_path, page_num))
+                    references.append(text if len(text) >= MIN_REFERENCE_CHARS else None)
+
+        ocr = GemmaOCR(model="bench-ocr", ollama_url=f"{server.url}/api/generate") if args.fake else GemmaOCR()
+        print(f"📄 {len(pages)} pages from {len(pdf_paths)} PDF(s), OCR model {ocr.model}")
+
+        results, baseline_texts = [], None
+        for name in ["baseline"] + [name for name in args.presets if name != "baseline"]:
+            print(f"⏱️ Running {name} ...", flush=True)
+            summary, texts = run_preset(name, pages, ocr, args)
+            baseline_texts = baseline_texts or texts
+            scores = [similarity(reference or baseline, text)
+                      for reference, baseline, text in zip(references, baseline_texts, texts)]
+            summary["fidelity"] = round(sum(scores) / len(scores), 3)
+            if name in args.presets:
+                results.append(summary)
+
+    print(f"\n{'preset':>10} {'KB/page':>8} {'images':>7} {'s/page':>7} {'fidelity':>9}  variant")
+    for r in results:
+        print(f"{r['preset']:>10} {r['kb_per_page']:>8} {r['images_per_page']:>7} {r['seconds_per_page']:>7} "
+              f"{r['fidelity']:>9}  {r['variant']}")
+    if args.fake:
+        print("⚠️ Fake OCR output: sizes and request counts are real, latency and fidelity are not.")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Measure page rasterization throughput against the number of render workers.
+
+Run from the backend folder, e.g.:
+
+    python -m benchmarks.bench_render --pages 200 --documents 2 --workers 1 2 4 8 16
+
+Renders every page of `--documents` synthetic scanned PDFs at the OCR settings
+(`OCR_DPI`, `OCR_IMAGE_FORMAT`, `OCR_IMAGE_QUALITY` unless overridden, and the
+image optimization settings) through `iter_rendered_pages`, once per worker
+count, and reports pages/sec and the speedup over in-process rendering. Pool start-up is timed separately, since
+the API keeps its pool for the lifetime of the process.
+"""
+import os
+import time
+import hashlib
+import argparse
+import tempfile
+from benchmarks.synthetic_pdfs import PDF_KINDS, make_pdf
+from services.pdf_to_text import OCR_DPI, OCR_IMAGE_FORMAT, OCR_IMAGE_QUALITY
+from services.page_renderer import OCR_RENDER_SHARD_PAGES, get_render_pool, iter_rendered_pages
+from services.image_optimizer import ImageOptimizer
+
+
+def render_all(pages: list, args, workers: int) -> tuple:
+    """Render `pages` and return (seconds, digest of the output in order)."""
+    optimizer = ImageOptimizer(args.dpi, args.image_format, args.image_quality)
+    digest = hashlib.sha256()
+    start = time.perf_counter()
+    for pdf_path, page_num, images, _ in iter_rendered_pages(pages, optimizer, workers=workers,
+                                                             shard_size=args.shard_pages):
+        digest.update(f"{pdf_path}:{page_num}:".encode("utf-8"))
+        for image_bytes in images:
+            digest.update(image_bytes)
+    return time.perf_counter() - start, digest.hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=100, help="pages per document")
+    parser.add_argument("--documents", type=int, default=1)
+    parser.add_argument("--kind", choices=PDF_KINDS, default="image")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--shard-pages", type=int, default=OCR_RENDER_SHARD_PAGES)
+    parser.add_argument("--dpi", type=int, default=OCR_DPI)
+    parser.add_argument("--image-format", default=OCR_IMAGE_FORMAT)
+    parser.add_argument("--image-quality", type=int, default=OCR_IMAGE_QUALITY)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="qbot-render-") as workdir:
+        pages = []
+        for index in range(args.documents):
+            pdf_path = make_pdf(os.path.join(workdir, f"doc-{index}.pdf"), args.pages, args.kind, seed=index)
+            pages.extend((pdf_path, page_num) for page_num in range(args.pages))
+        print(f"📄 {args.documents} x {args.pages} {args.kind} pages at {args.dpi} DPI "
+              f"({args.image_format}), {os.cpu_count()} CPUs")
+
+        results, reference = [], None
+        for workers in args.workers:
+            startup = 0.0
+            if workers > 1:
+                start = time.perf_counter()
+                pool = get_render_pool(workers)
+                list(pool.map(abs, range(workers)))  # start every worker process before timing
+                startup = time.perf_counter() - start
+            seconds, digest = render_all(pages, args, workers)
+            reference = reference or digest
+            results.append((workers, seconds, startup, digest == reference))
+
+    baseline = results[0][1]
+    print(f"\n{'workers':>8} {'seconds':>8} {'pages/s':>8} {'speedup':>8} {'startup':>8} {'same output':>12}")
+    for workers, seconds, startup, same in results:
+        print(f"{workers:>8} {seconds:>8.2f} {len(pages) / seconds:>8.1f} {baseline / seconds:>7.2f}x "
+              f"{startup:>7.2f}s {'yes' if same else 'NO':>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Check that importing the API stays fast and doesn't load the pipeline.
+
+Run from the backend folder, e.g.:
+
+    python -m benchmarks.bench_startup --budget 1.0
+
+Imports `main` in fresh interpreters and reports the median import time and
+the slowest imports it pulls in. Exits with status 1 if the median exceeds
+`--budget` seconds or if a heavy pipeline dependency (langchain, Chroma,
+PyMuPDF, ...) was imported, so it can gate CI or a pre-commit hook.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Only needed once a pipeline runs; see services/readiness.py
+HEAVY_MODULES = ("langchain", "langchain_community", "langchain_ollama", "chromadb", "fitz", "numpy", "ollama")
+
+PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def measure_import(env: dict) -> dict:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    # -X importtime writes "import time: self [us] | cumulative | name" lines to stderr
+    # with two spaces of indent per nesting level
+    imports = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        depth = (len(parts[2]) - len(parts[2].lstrip()) - 1) // 2
+        if 1 <= depth <= 2:  # what main and its direct imports pull in
+            imports.append((parts[2].strip(), int(parts[1]) / 1e6))
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    probe["imports"] = imports
+    return probe
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=1.0, help="Maximum median import time in seconds")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="Slowest imports to show")
+    args = parser.parse_args()
+
+    # Startup must not depend on the Ollama settings being present
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("OLLAMA_HOST_URL", "OCR_MODEL", "EMBEDDING_MODEL", "MCQ_MODEL")}
+    runs = [measure_import(env) for _ in range(args.repeat)]
+    median = statistics.median(run["seconds"] for run in runs)
+    heavy = sorted({module for run in runs for module in run["heavy"]})
+
+    print(f"\nimport main: median {median:.3f}s over {args.repeat} runs (budget {args.budget:.3f}s)")
+    for name, seconds in sorted(runs[-1]["imports"], key=lambda item: -item[1])[:args.top]:
+        print(f"  {seconds:>7.3f}s  {name}")
+
+    failures = []
+    if median > args.budget:
+        failures.append(f"median import time {median:.3f}s exceeds the {args.budget:.3f}s budget")
+    if heavy:
+        failures.append(f"pipeline dependencies imported at startup: {', '.join(heavy)}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✅ Startup is within budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""A local stand-in for the Ollama HTTP API, for tests and benchmarks without real models.
+
+Serves /api/generate, /api/chat and /api/embed (plus /api/ps and /api/tags)
+and simulates model residency: a request for a model that isn't loaded waits
+`load_latency` seconds, and loading beyond `max_loaded` models evicts the
+least recently used one. Generation takes `request_latency` plus the output
+tokens at `token_rate` tokens/sec, and `failure_rate` of the generate/chat
+requests fail with HTTP 500. Load/unload, call and failure counts are available from GET /stats.
+
+    python -m benchmarks.fake_ollama --port 11435 --load-latency 2 --max-loaded 1
+"""
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from collections import Counter, OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllamaState:
+    """Shared configuration and counters of one fake server."""
+
+    def __init__(self, load_latency: float = 0.0, max_loaded: int = 1, request_latency: float = 0.0,
+                 embedding_dim: int = 64, token_rate: float = 0.0, failure_rate: float = 0.0,
+                 ocr_words: int = 200, seed: int = None):
+        self.load_latency = load_latency
+        self.max_loaded = max_loaded
+        self.request_latency = request_latency
+        self.embedding_dim = embedding_dim
+        self.token_rate = token_rate  # output tokens/sec, 0 means instant
+        self.failure_rate = failure_rate
+        self.ocr_words = ocr_words  # words of text returned per OCR'd page
+        self.random = random.Random(seed)
+        self.loaded = OrderedDict()  # model -> keep_alive, in LRU order
+        self.loads = Counter()
+        self.unloads = Counter()
+        self.calls = Counter()
+        self.failures = Counter()
+        self._load_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+
+    def count_call(self, path: str):
+        with self._counter_lock:
+            self.calls[path] += 1
+
+    def should_fail(self, path: str) -> bool:
+        with self._counter_lock:
+            if self.random.random() >= self.failure_rate:
+                return False
+            self.failures[path] += 1
+            return True
+
+    def generate_delay(self, tokens: int):
+        """Sleep for the request latency plus the time to produce `tokens` output tokens."""
+        time.sleep(self.request_latency + (tokens / self.token_rate if self.token_rate else 0.0))
+
+    def ensure_loaded(self, model: str):
+        """Simulate Ollama's scheduler: loading is serialized and evicts the LRU model."""
+        with self._load_lock:
+            if model in self.loaded:
+                self.loaded.move_to_end(model)
+                return
+            while len(self.loaded) >= self.max_loaded:
+                evicted, _ = self.loaded.popitem(last=False)
+                self.unloads[evicted] += 1
+            time.sleep(self.load_latency)
+            self.loaded[model] = True
+            self.loads[model] += 1
+
+    def stats(self) -> dict:
+        return {
+            "loads": dict(self.loads),
+            "unloads": dict(self.unloads),
+            "calls": dict(self.calls),
+            "failures": dict(self.failures),
+            "loaded": list(self.loaded),
+        }
+
+    def reset(self):
+        with self._load_lock, self._counter_lock:
+            self.loaded.clear()
+            self.loads.clear()
+            self.unloads.clear()
+            self.calls.clear()
+            self.failures.clear()
+
+
+def fake_mcq(seed: str) -> dict:
+    n = int(hashlib.sha256(seed.encode("utf-8")).hexdigest()[:8], 16)
+    return {
+        "question": f"Which statement about topic {n} is correct?",
+        "options": {"A": f"Statement {n}", "B": "Something else", "C": "Neither", "D": "Both"},
+        "correct_answer": "A",
+        "description": f"Topic {n} is described by statement {n}.",
+    }
+
+
+def fake_chat_content(body: dict) -> str:
+    """Answer in the shape requested by `format`, so schema validation passes."""
+    prompt = json.dumps(body.get("messages", []))
+    seed = f"{prompt}{random.random()}"
+    fmt = body.get("format")
+    if isinstance(fmt, dict) and "questions" in fmt.get("properties", {}):
+        count = fmt["properties"]["questions"].get("minItems", 1)
+        return json.dumps({"questions": [fake_mcq(f"{seed}{i}") for i in range(count)]})
+    if fmt:
+        return json.dumps(fake_mcq(seed))
+    return "This is a fake answer."
+
+
+WORDS = ("data", "model", "system", "value", "process", "result", "method", "energy", "network", "signal",
+         "theory", "market", "policy", "sample", "layer", "volume", "factor", "record", "output", "source")
+
+
+def fake_page_text(seed: str, words: int) -> str:
+    """Deterministic page-like text, different for every page image."""
+    rng = random.Random(hashlib.sha256(seed.encode("utf-8")).digest())
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(6, 14))
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(f"{sentence.capitalize()} {rng.randint(1, 9999)}.")
+        words -= length
+    return " ".join(sentences)
+
+
+def fake_embedding(text: str, dim: int) -> list:
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    rng = random.Random(digest)
+    return [rng.uniform(-1, 1) for _ in range(dim)]
+
+
+def make_handler(state: FakeOllamaState):
+    class FakeOllamaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload, status=200):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_ndjson(self, lines):
+            data = "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                return self._send_json(state.stats())
+            if self.path == "/api/ps":
+                return self._send_json({"models": [{"name": model} for model in state.loaded]})
+            if self.path == "/api/tags":
+                return self._send_json({"models": []})
+            self._send_json({"error": "not found"}, status=404)
+
+        def do_DELETE(self):
+            if self.path == "/stats":
+                state.reset()
+                return self._send_json({})
+            self._send_json({"error": "not found"}, status=404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            state.count_call(self.path)
+            model = body.get("model", "")
+            state.ensure_loaded(model)
+            if self.path != "/api/embed" and state.should_fail(self.path):
+                return self._send_json({"error": "simulated failure"}, status=500)
+
+            if self.path == "/api/generate":
+                if not body.get("prompt"):
+                    # An empty prompt only loads the model, as in Ollama
+                    return self._send_json({"model": model, "response": "", "done": True})
+                image = body.get("images", [""])[0]
+                text = fake_page_text(f"{model}{hashlib.sha256(image.encode('utf-8')).hexdigest()}", state.ocr_words)
+                words = text.split(" ")
+                state.generate_delay(len(words))
+                lines = [{"model": model, "response": word + " ", "done": False} for word in words]
+                lines.append({"model": model, "response": "", "done": True, "eval_count": len(words)})
+                if body.get("stream", True):
+                    return self._send_ndjson(lines)
+                return self._send_json({"model": model, "response": text, "done": True, "eval_count": len(words)})
+
+            if self.path == "/api/chat":
+                content = fake_chat_content(body)
+                eval_count = len(content) // 4
+                state.generate_delay(eval_count)
+                return self._send_json({
+                    "model": model,
+                    "message": {"role": "assistant", "content": content},
+                    "done": True,
+                    "prompt_eval_count": len(json.dumps(body.get("messages", []))) // 4,
+                    "eval_count": eval_count,
+                })
+
+            if self.path == "/api/embed":
+                inputs = body.get("input", "")
+                inputs = [inputs] if isinstance(inputs, str) else inputs
+                return self._send_json({
+                    "model": model,
+                    "embeddings": [fake_embedding(text, state.embedding_dim) for text in inputs],
+                })
+
+            self._send_json({"error": f"unknown endpoint {self.path}"}, status=404)
+
+    return FakeOllamaHandler
+
+
+class FakeOllamaServer:
+    """Run the fake API on a background thread; usable as a context manager."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **state_kwargs):
+        self.state = FakeOllamaState(**state_kwargs)
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.state))
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--load-latency", type=float, default=2.0, help="seconds to load a model")
+    parser.add_argument("--max-loaded", type=int, default=1, help="models that fit in memory at once")
+    parser.add_argument("--request-latency", type=float, default=0.1, help="seconds per generate/chat request")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="output tokens/sec, 0 for instant")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(args.host, args.port, load_latency=args.load_latency,
+                              max_loaded=args.max_loaded, request_latency=args.request_latency,
+                              token_rate=args.token_rate, failure_rate=args.failure_rate)
+    print(f"Fake Ollama listening on {server.url}")
+    server.httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
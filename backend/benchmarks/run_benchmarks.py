@@ -0,0 +1,212 @@
+"""End-to-end pipeline benchmarks against a local fake Ollama server.
+
+Run from the backend folder, e.g.:
+
+    python -m benchmarks.run_benchmarks --scenarios text-10 image-10 text-100
+    python -m benchmarks.run_benchmarks --save-baseline
+    python -m benchmarks.run_benchmarks --check --threshold 0.25
+
+Every scenario is `<kind>-<pages>`: a synthetic PDF with a text layer
+("text") or made of page pictures ("image", every page is OCR'd), 1-500
+pages. Each one runs `generate_mcqs_pipeline` in a fresh subprocess with
+empty caches, against a fake Ollama (see `benchmarks/fake_ollama.py`) with
+the given latency, token rate and failure rate. Reported per scenario:
+per-stage wall time, pages/sec, questions/sec, peak RSS and the HTTP calls
+the fake server received.
+
+`--save-baseline` writes one JSON file per scenario to `--baseline-dir`;
+`--check` compares against them and exits with status 1 when a metric is
+worse than the baseline by more than `--threshold`, or when a scenario has
+no baseline. The committed baselines in `benchmarks/baselines/` were taken
+with the default settings; timings depend on the machine, so save new ones
+before checking on different hardware.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+from benchmarks.fake_ollama import FakeOllamaServer
+from benchmarks.synthetic_pdfs import PDF_KINDS, make_pdf
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE_DIR = os.path.join(BACKEND_DIR, "benchmarks", "baselines")
+DEFAULT_SCENARIOS = ("text-10", "image-10", "text-100", "image-50")
+RESULT_PREFIX = "BENCH_RESULT "
+MAX_PAGES = 500
+
+# metric -> (True if higher is better, the timing it is measured over); compared by --check
+CHECKED_METRICS = {
+    "total_seconds": (False, "total_seconds"),
+    "extract_seconds": (False, "extract_seconds"),
+    "generate_seconds": (False, "generate_seconds"),
+    "pages_per_sec": (True, "extract_seconds"),
+    "questions_per_sec": (True, "generate_seconds"),
+    "peak_rss_mb": (False, None),
+    "http_calls": (False, None),
+}
+NOISE_SECONDS = 0.25  # timing differences below this are run-to-run noise, whatever their ratio
+
+
+def parse_scenario(name: str) -> tuple:
+    kind, _, pages = name.partition("-")
+    if kind not in PDF_KINDS or not pages.isdigit() or not 1 <= int(pages) <= MAX_PAGES:
+        raise argparse.ArgumentTypeError(f"Scenario must look like text-10 or image-250 (1-{MAX_PAGES} pages): {name}")
+    return kind, int(pages)
+
+
+def run_worker(upload_folder: str, num_questions: int):
+    """Inside the subprocess: run the pipeline once and print its measurements."""
+    import resource
+    from services.preprocessing import generate_mcqs_pipeline
+
+    start = time.perf_counter()
+    result = generate_mcqs_pipeline(upload_folder=upload_folder, num_questions=num_questions)
+    elapsed = time.perf_counter() - start
+    pages = sum(len(report) for report in result["pages"].values())
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # kilobytes on Linux
+    print(RESULT_PREFIX + json.dumps({
+        "seconds": elapsed,
+        "timings": result["timings"],
+        "pages": pages,
+        "questions": len(result["mcqs"]),
+        "peak_rss_mb": peak_rss_kb / 1024,
+        "generation": result["generation"],
+    }))
+
+
+def run_scenario(name: str, args, server: FakeOllamaServer, workdir: str) -> dict:
+    kind, pages = parse_scenario(name)
+    upload_folder = os.path.join(workdir, name, "upload")
+    os.makedirs(upload_folder, exist_ok=True)
+    make_pdf(os.path.join(upload_folder, f"{name}.pdf"), pages, kind)
+
+    # Fresh caches per scenario, so nothing is reused between runs
+    state_dir = os.path.join(workdir, name, "state")
+    env = {
+        **os.environ,
+        "OLLAMA_HOST_URL": server.url,
+        "OCR_MODEL": "bench-ocr",
+        "MCQ_MODEL": "bench-mcq",
+        "EMBEDDING_MODEL": "bench-embed",
+        "OCR_CACHE_PATH": os.path.join(state_dir, "ocr_cache.sqlite3"),
+        "STAGE_CACHE_DIR": os.path.join(state_dir, "stages"),
+        "PERSIST_DIRECTORY": os.path.join(state_dir, "chroma"),
+        "WORKSPACE_ROOT": os.path.join(state_dir, "runs"),
+        "QUESTION_BANK_PATH": os.path.join(state_dir, "question_bank.sqlite3"),
+        "ANONYMIZED_TELEMETRY": "False",
+    }
+    server.state.reset()
+    command = [sys.executable, "-m", "benchmarks.run_benchmarks", "--worker", upload_folder,
+               "--questions", str(args.questions)]
+    completed = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    lines = [line for line in completed.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError(f"Scenario {name} failed:\n{completed.stdout[-2000:]}\n{completed.stderr[-2000:]}")
+    measured = json.loads(lines[-1][len(RESULT_PREFIX):])
+    server_stats = server.state.stats()
+
+    timings = measured["timings"]
+    return {
+        "scenario": name,
+        "kind": kind,
+        "pages": measured["pages"],
+        "questions": measured["questions"],
+        "total_seconds": round(measured["seconds"], 3),
+        "extract_seconds": timings.get("extract", 0.0),
+        "embed_seconds": timings.get("embed", 0.0),
+        "generate_seconds": timings.get("generate", 0.0),
+        "pages_per_sec": round(measured["pages"] / timings["extract"], 2) if timings.get("extract") else None,
+        "questions_per_sec": round(measured["questions"] / timings["generate"], 2) if timings.get("generate") else None,
+        "peak_rss_mb": round(measured["peak_rss_mb"], 1),
+        "http_calls": sum(server_stats["calls"].values()),
+        "http_calls_by_endpoint": server_stats["calls"],
+        "http_failures": sum(server_stats["failures"].values()),
+        "fake_server": {"latency": args.latency, "token_rate": args.token_rate, "failure_rate": args.failure_rate},
+    }
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> list:
+    """Return a message per metric that regressed by more than `threshold`."""
+    regressions = []
+    for metric, (higher_is_better, timing) in CHECKED_METRICS.items():
+        current, previous = result.get(metric), baseline.get(metric)
+        if not current or not previous:
+            continue
+        if timing and abs((result.get(timing) or 0.0) - (baseline.get(timing) or 0.0)) < NOISE_SECONDS:
+            continue
+        change = (current - previous) / previous
+        if (higher_is_better and change < -threshold) or (not higher_is_better and change > threshold):
+            regressions.append(f"{result['scenario']}: {metric} {previous} -> {current} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=list(DEFAULT_SCENARIOS))
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake seconds per generate/chat request")
+    parser.add_argument("--token-rate", type=float, default=2000.0, help="fake output tokens/sec")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of failing generate/chat calls")
+    parser.add_argument("--baseline-dir", default=DEFAULT_BASELINE_DIR)
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baselines")
+    parser.add_argument("--check", action="store_true", help="Fail if a result regressed against its baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression for --check")
+    parser.add_argument("--output", help="Optional path to write all results as JSON")
+    parser.add_argument("--worker", metavar="UPLOAD_FOLDER", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args.worker, args.questions)
+    for name in args.scenarios:
+        parse_scenario(name)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="qbot-bench-") as workdir, \
+            FakeOllamaServer(request_latency=args.latency, token_rate=args.token_rate,
+                             failure_rate=args.failure_rate, max_loaded=3, seed=0) as server:
+        for name in args.scenarios:
+            print(f"⏱️ Running {name} ...", flush=True)
+            results.append(run_scenario(name, args, server, workdir))
+
+    print(f"\n{'scenario':>10} {'total s':>8} {'extract':>8} {'embed':>7} {'generate':>8} "
+          f"{'pages/s':>8} {'q/s':>6} {'RSS MB':>7} {'calls':>6}")
+    for r in results:
+        print(f"{r['scenario']:>10} {r['total_seconds']:>8} {r['extract_seconds']:>8} {r['embed_seconds']:>7} "
+              f"{r['generate_seconds']:>8} {r['pages_per_sec']!s:>8} {r['questions_per_sec']!s:>6} "
+              f"{r['peak_rss_mb']:>7} {r['http_calls']:>6}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+    if args.save_baseline:
+        os.makedirs(args.baseline_dir, exist_ok=True)
+        for r in results:
+            with open(os.path.join(args.baseline_dir, f"{r['scenario']}.json"), "w", encoding="utf-8") as f:
+                json.dump(r, f, indent=4)
+        print(f"💾 Saved {len(results)} baselines to {args.baseline_dir}")
+
+    if args.check:
+        regressions, missing = [], []
+        for r in results:
+            path = os.path.join(args.baseline_dir, f"{r['scenario']}.json")
+            if not os.path.exists(path):
+                missing.append(r["scenario"])
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                regressions.extend(compare(r, json.load(f), args.threshold))
+        if missing:
+            print(f"❌ No baseline for: {', '.join(missing)} (create one with --save-baseline)")
+        for regression in regressions:
+            print(f"❌ {regression}")
+        if regressions or missing:
+            sys.exit(1)
+        print("✅ No regressions beyond the threshold.")
+
+
+if __name__ == "__main__":
+    main()
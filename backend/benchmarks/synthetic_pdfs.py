@@ -0,0 +1,72 @@
+"""Generate synthetic PDFs for benchmarks.
+
+"text" PDFs have a real text layer, so the page classifier reads them natively.
+"image" PDFs contain the same kind of page rendered to a picture without any
+text layer, like a scan, so every page goes through OCR.
+
+    python -m benchmarks.synthetic_pdfs --pages 50 --kind image --output scan.pdf
+"""
+import random
+import argparse
+import fitz  # PyMuPDF
+
+from benchmarks.fake_ollama import fake_page_text
+
+PDF_KINDS = ("text", "image")
+PAGE_WORDS = 250
+SCAN_DPI = 100  # resolution of the picture an "image" page is made of
+
+
+def page_text(seed: int, page_index: int, words: int = PAGE_WORDS) -> str:
+    text = fake_page_text(f"{seed}:{page_index}", words)
+    # Paragraph breaks give the text splitter natural boundaries
+    sentences = text.split(". ")
+    rng = random.Random(page_index)
+    paragraphs, current = [], []
+    for sentence in sentences:
+        current.append(sentence)
+        if len(current) >= rng.randint(3, 6):
+            paragraphs.append(". ".join(current))
+            current = []
+    if current:
+        paragraphs.append(". ".join(current))
+    return f"Section {page_index + 1}\n\n" + "\n\n".join(paragraphs)
+
+
+def write_text_page(doc, text: str):
+    page = doc.new_page()
+    page.insert_textbox(page.rect + (54, 54, -54, -54), text, fontsize=10)
+
+
+def make_pdf(path: str, pages: int, kind: str = "text", seed: int = 0) -> str:
+    """Write a `pages`-page PDF of the given kind to `path` and return the path."""
+    if kind not in PDF_KINDS:
+        raise ValueError(f"Unsupported PDF kind '{kind}'. Use one of: {', '.join(PDF_KINDS)}")
+    with fitz.open() as doc:
+        for index in range(pages):
+            text = page_text(seed, index)
+            if kind == "text":
+                write_text_page(doc, text)
+                continue
+            # Render a text page and keep only its picture
+            with fitz.open() as scratch:
+                write_text_page(scratch, text)
+                pixmap = scratch[0].get_pixmap(dpi=SCAN_DPI, colorspace=fitz.csGRAY)
+                page = doc.new_page(width=scratch[0].rect.width, height=scratch[0].rect.height)
+                page.insert_image(page.rect, stream=pixmap.tobytes("png"))
+        doc.save(path, garbage=3, deflate=True)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--kind", choices=PDF_KINDS, default="text")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="synthetic.pdf")
+    args = parser.parse_args()
+    print(make_pdf(args.output, args.pages, args.kind, args.seed))
+
+
+if __name__ == "__main__":
+    main()
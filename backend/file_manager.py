@@ -1,18 +1,92 @@
 from fastapi import UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from dotenv import load_dotenv
 from pathlib import Path
+import hashlib
+import shutil
+import uuid
 import os
 
-from grpc import services
+from services.hashing import file_sha256, forget_sha256, record_sha256
+from services.vector_store import delete_document_vectors
+
+# Load environment variables from .env file
+load_dotenv()
 
 # Define the base folder path
 BASE_DIR = Path(__file__).parent.parent  # assuming the script is in 'ollama_qbot/backend'
 UPLOAD_FOLDER = BASE_DIR / "upload"
+# Content-addressed copy of every upload: <digest>.pdf, hard-linked into UPLOAD_FOLDER
+BLOB_FOLDER = BASE_DIR / "upload_store"
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # bytes read per step
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(512 * 1024 * 1024)))  # per file
 
 # Ensure the upload directory exists
 UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)  # Creates the folder if it doesn't exist
+BLOB_FOLDER.mkdir(parents=True, exist_ok=True)
+
+
+def blob_path(digest: str) -> Path:
+    return BLOB_FOLDER / f"{digest}.pdf"
+
+
+async def stream_to_blob(file: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> tuple[str, int, bool]:
+    """Stream an upload into the content-addressed store, hashing it on the way.
+
+    Returns (sha256, size, already_stored). Reads are chunked and writes run in
+    the threadpool, so neither memory nor the event loop is tied up by big PDFs.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = BLOB_FOLDER / f".upload-{uuid.uuid4().hex}"
+    try:
+        with open(tmp_path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413,
+                                        detail=f"{file.filename} is larger than {max_bytes} bytes.")
+                digest.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+
+        sha256 = digest.hexdigest()
+        target = blob_path(sha256)
+        if target.exists():
+            return sha256, size, True  # identical content was uploaded before
+        os.replace(tmp_path, target)
+        return sha256, size, False
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
 
-async def save_uploaded_files(files: list[UploadFile]) -> list[str]:
-    uploaded_file_names = []
+def link_upload(sha256: str, filename: str) -> str:
+    """Expose a stored blob in the upload folder and return the name it got.
+
+    Re-uploading the same content under the same name is a no-op; a different
+    file with an existing name gets the start of its digest appended instead of
+    overwriting it.
+    """
+    name = Path(filename).name
+    location = UPLOAD_FOLDER / name
+    if location.exists():
+        if file_sha256(str(location)) == sha256:
+            return name
+        name = f"{location.stem}-{sha256[:8]}{location.suffix}"
+        location = UPLOAD_FOLDER / name
+        if location.exists():
+            return name  # the same content was already renamed this way
+
+    try:
+        os.link(blob_path(sha256), location)
+    except OSError:
+        shutil.copyfile(blob_path(sha256), location)  # e.g. filesystems without hard links
+    record_sha256(str(location), sha256)
+    return name
+
+
+async def save_uploaded_files(files: list[UploadFile]) -> list[dict]:
+    uploaded_files = []
 
     # Iterate over all the files received in the request
     for file in files:
@@ -20,25 +94,31 @@ async def save_uploaded_files(files: list[UploadFile]) -> list[str]:
         if not file.filename.endswith(".pdf"):
             raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
 
-        file_location = UPLOAD_FOLDER / file.filename
+        sha256, size, deduplicated = await stream_to_blob(file)
+        name = await run_in_threadpool(link_upload, sha256, file.filename)
+
+        uploaded_files.append({"file": name, "sha256": sha256, "size": size, "deduplicated": deduplicated})
 
-        # Save the file to the upload folder
-        with open(file_location, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        uploaded_file_names.append(file.filename)
-    
-    return uploaded_file_names
+    return uploaded_files
 
-# Function to delete all PDF files from the upload folder
+# Function to delete all PDF files from the upload folder, together with their vectors
 def delete_all_pdfs() -> list[str]:
     deleted_files = []
-    
+    deleted_hashes = []
+
     # Iterate over the files in the upload folder
     for file in UPLOAD_FOLDER.iterdir():
         if file.suffix.lower() == ".pdf":  # Check if the file is a PDF
+            deleted_hashes.append(file_sha256(str(file)))  # Vectors are namespaced by content hash
             os.remove(file)  # Delete the file
             deleted_files.append(file.name)  # Add the deleted file's name to the list
-    
+
+    forget_sha256([str(UPLOAD_FOLDER / name) for name in deleted_files])
+    for sha256 in set(deleted_hashes):
+        blob_path(sha256).unlink(missing_ok=True)
+
+    if deleted_hashes:
+        removed = delete_document_vectors(deleted_hashes)
+        print(f"🗑️ Removed {removed} vectors of {len(deleted_hashes)} deleted PDFs")
+
     return deleted_files
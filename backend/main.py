@@ -1,5 +1,9 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from views import api
+from services.jobs import get_job_manager
+from services.readiness import start_warm_up
+from services.metrics import render_metrics
 
 app = FastAPI(
     title="Ollama Question Simulator", 
@@ -7,6 +11,24 @@ app = FastAPI(
     version="1.0.0",       
               )
 app.include_router(api)
+
+
+# Prometheus scrape endpoint: stage timings, Ollama latency/tokens/errors per model
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.on_event("startup")
+def warm_up():
+    # Import the pipeline and load the models in the background; see /api/ready
+    start_warm_up()
+
+
+@app.on_event("shutdown")
+def shutdown_jobs():
+    get_job_manager().shutdown()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
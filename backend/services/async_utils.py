@@ -0,0 +1,18 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_sync(coro):
+    """Run a coroutine to completion from synchronous code.
+
+    The pipeline is synchronous but may be called from inside a running event
+    loop (e.g. a FastAPI `async def` endpoint), where `asyncio.run` is not
+    allowed. In that case the coroutine gets its own loop on a helper thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
@@ -0,0 +1,77 @@
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 1.0 = most representative chunks only, 0.0 = pure farthest-point spread
+CHUNK_SELECTION_LAMBDA = float(os.getenv("CHUNK_SELECTION_LAMBDA", "0.3"))
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length so dot products are cosine similarities."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def select_diverse_chunks(embeddings, k: int, relevance_weight: float = CHUNK_SELECTION_LAMBDA) -> list:
+    """Pick `k` chunk indices that cover the document with maximal marginal relevance.
+
+    Each step scores every chunk as
+    `relevance_weight * sim(chunk, centroid) - (1 - relevance_weight) * max sim(chunk, selected)`
+    and takes the best one, so picks are representative of the document but
+    mutually distant. The first pick is the chunk closest to the centroid.
+    Everything is a matrix-vector product per pick, i.e. O(N * k * dim).
+    """
+    k = min(k, len(embeddings))
+    if k <= 0:
+        return []  # nothing to normalize, e.g. every chunk of the document is already used
+    vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    count = vectors.shape[0]
+
+    centroid = vectors.mean(axis=0)
+    centroid /= np.linalg.norm(centroid) or 1.0
+    relevance = vectors @ centroid
+
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of every chunk to anything selected so far
+    max_similarity = vectors @ vectors[selected[0]]
+    available = np.ones(count, dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < k:
+        scores = relevance_weight * relevance - (1.0 - relevance_weight) * max_similarity
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        np.maximum(max_similarity, vectors @ vectors[pick], out=max_similarity)
+
+    return selected
+
+
+def select_fresh_chunks(embeddings, k: int, used: set, relevance_weight: float = CHUNK_SELECTION_LAMBDA) -> list:
+    """`select_diverse_chunks`, but chunk indices in `used` are only picked once every other one is."""
+    fresh = [index for index in range(len(embeddings)) if index not in used]
+    stale = [index for index in range(len(embeddings)) if index in used]
+    selected = []
+    if fresh:
+        selected = [fresh[pick] for pick in
+                    select_diverse_chunks([embeddings[index] for index in fresh], k, relevance_weight)]
+    if len(selected) < k and stale:
+        selected += [stale[pick] for pick in select_diverse_chunks([embeddings[index] for index in stale],
+                                                                   k - len(selected), relevance_weight)]
+    return selected
+
+
+def group_related_chunks(embeddings, seeds: list, group_size: int) -> list:
+    """For each seed index, return it together with its `group_size - 1` most similar chunks."""
+    if group_size <= 1:
+        return [[seed] for seed in seeds]
+    vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    similarity = vectors[seeds] @ vectors.T  # one (len(seeds), N) product for all groups
+    similarity[np.arange(len(seeds)), seeds] = -np.inf  # a seed is not its own neighbour
+    # With fewer chunks than the group size, the seed's own -inf entry must not be reached
+    neighbours = np.argsort(-similarity, axis=1)[:, :min(group_size - 1, vectors.shape[0] - 1)]
+    return [[seed, *map(int, row)] for seed, row in zip(seeds, neighbours)]
@@ -0,0 +1,69 @@
+from itertools import groupby
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
+MIN_CHUNK_CHARS = 200  # pages with less text are joined with the next page
+SEPARATORS = ["\n\n", "\n", ". ", " ", ""]  # paragraphs first, then lines, sentences and words
+
+
+def chunk_key(doc_hash: str, page_start: int, page_end: int, offset: int) -> str:
+    """Stable chunk identity: the document, the pages it was cut from and where it starts on them."""
+    return f"{doc_hash}:p{page_start}-{page_end}:{offset}"
+
+
+class PageChunker:
+    """Cut page records into chunks that keep their provenance.
+
+    Records ({"file", "sha256", "page", "text", ...}) are consumed as a
+    stream, one page at a time. Chunks never cross a page boundary, except
+    that pages shorter than `min_chars` are joined with the pages after them,
+    and are cut at paragraph breaks where possible. No chunk is shorter than
+    `min_chars` unless its whole span is. A chunk's boundaries
+    therefore only depend on its own page, so editing a page changes the
+    chunks of that page and leaves every other chunk, and its id, as it was.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                 min_chars: int = MIN_CHUNK_CHARS):
+        self.min_chars = min_chars
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                                       separators=SEPARATORS, add_start_index=True)
+
+    def split_span(self, source: str, doc_hash: str, page_start: int, page_end: int, text: str):
+        # [start, end) of every piece; a piece shorter than `min_chars` (e.g. a short page
+        # cut off at the paragraph break it was joined with) is merged into its neighbour
+        pieces = []
+        for document in self.splitter.create_documents([text]):
+            if not document.page_content.strip():
+                continue
+            start = document.metadata["start_index"]
+            end = start + len(document.page_content)
+            if pieces and min(end - start, pieces[-1][1] - pieces[-1][0]) < self.min_chars:
+                pieces[-1][1] = max(pieces[-1][1], end)
+            else:
+                pieces.append([start, end])
+        for offset, end in pieces:
+            yield {
+                "id": chunk_key(doc_hash, page_start, page_end, offset),
+                "text": text[offset:end],
+                "metadata": {"doc_hash": doc_hash, "source": source, "page_start": page_start,
+                             "page_end": page_end, "offset": offset},
+            }
+
+    def iter_chunks(self, records):
+        """Yield {"id", "text", "metadata"} chunks for page records in document and page order."""
+        for (source, doc_hash), pages in groupby(records, key=lambda record: (record["file"], record["sha256"])):
+            pending = None  # [page_start, page_end, text] of short pages waiting for the next one
+            for record in pages:
+                text = (record["text"] or "").strip()
+                if pending is not None:
+                    pending[1] = record["page"]
+                    pending[2] = f"{pending[2]}\n\n{text}" if text else pending[2]
+                elif text:
+                    pending = [record["page"], record["page"], text]
+                if pending is not None and len(pending[2]) >= self.min_chars:
+                    yield from self.split_span(source, doc_hash, *pending)
+                    pending = None
+            if pending is not None:
+                yield from self.split_span(source, doc_hash, *pending)
@@ -3,14 +3,14 @@ import os
 from dotenv import load_dotenv
 from langchain_community.document_loaders import UnstructuredPDFLoader
 from langchain_community.document_loaders import OnlinePDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain.embeddings import OllamaEmbeddings
 from langchain.vectorstores import Chroma
-from langchain.schema import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 import fitz  # PyMuPDF
+from services.hashing import file_sha256
+from services.chunker import PageChunker
+from services.vector_store import upsert_chunk_stream
 
 load_dotenv()
 
@@ -24,31 +24,29 @@ file_path_local = 'file/Data.pdf'
 # Open the PDF
 doc = fitz.open(file_path_local)
 
-# Extract text from all pages
-pdf_text = ""
-for page_num in range(doc.page_count):
-    page = doc.load_page(page_num)
-    pdf_text += page.get_text()
+# Extract the text of every page as a page record
+pdf_hash = file_sha256(file_path_local)
+pages = (
+    {"file": os.path.basename(file_path_local), "sha256": pdf_hash, "page": page_num + 1,
+     "text": doc.load_page(page_num).get_text()}
+    for page_num in range(doc.page_count)
+)
 
-# Print the extracted text
-# print(pdf_text)
-
-# Create a Document object to hold the text content
-document = Document(page_content=pdf_text)
-
-# Set up the RecursiveCharacterTextSplitter
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=50)
-
-# Split the document into chunks
-data_chunks = text_splitter.split_documents([document])
+# Split the pages into chunks, the same way the MCQ pipeline does
+chunks = list(PageChunker().iter_chunks(pages))
+for chunk in chunks:
+    chunk["metadata"]["uploaded_at"] = os.path.getmtime(file_path_local)
 
 # Print the results
 print("Data chunks created....")
-for chunk in data_chunks:
-    print(chunk.page_content)
+for chunk in chunks:
+    print(chunk["text"])
 
 # Use the correct model name
 embedding = OllamaEmbeddings(model=EMBEDDING_MODEL, show_progress=True)
 
-# Store chunks and embeddings in Chroma
-Chroma.from_documents(data_chunks, embedding, persist_directory=PERSIST_DIRECTORY, collection_name=OLLAMA_COLLECTION_NAME)
+# Store chunks and embeddings in Chroma, with the metadata the pipeline's reuse and garbage collection rely on
+vector_db = Chroma(persist_directory=PERSIST_DIRECTORY, embedding_function=embedding,
+                   collection_name=OLLAMA_COLLECTION_NAME)
+stats = upsert_chunk_stream(vector_db, embedding, chunks, EMBEDDING_MODEL)
+print(f"✅ Embedded {stats['new']} new chunks ({stats['reused']} already stored)")
@@ -0,0 +1,68 @@
+import os
+import json
+import hashlib
+import threading
+
+HASH_BLOCK_SIZE = 1024 * 1024  # 1 MiB reads keep memory flat on large PDFs
+DIGEST_INDEX_NAME = ".sha256_index.json"  # per-folder record of digests computed at upload time
+
+_index_lock = threading.Lock()
+
+
+def _index_path(path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(path)), DIGEST_INDEX_NAME)
+
+
+def _load_index(index_path: str) -> dict:
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_index(index_path: str, index: dict):
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+
+
+def record_sha256(path: str, digest: str):
+    """Remember a digest computed elsewhere (e.g. while streaming an upload) for `file_sha256`."""
+    stat = os.stat(path)
+    index_path = _index_path(path)
+    with _index_lock:
+        index = _load_index(index_path)
+        index[os.path.basename(path)] = {"sha256": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        _save_index(index_path, index)
+
+
+def forget_sha256(paths: list):
+    """Drop index entries of files that were removed."""
+    by_index = {}
+    for path in paths:
+        by_index.setdefault(_index_path(path), []).append(os.path.basename(path))
+    with _index_lock:
+        for index_path, names in by_index.items():
+            index = _load_index(index_path)
+            if any(index.pop(name, None) for name in names):
+                _save_index(index_path, index)
+
+
+def file_sha256(path: str) -> str:
+    """Return the hex SHA-256 digest of a file's bytes.
+
+    A digest recorded with `record_sha256` is reused while the file's size and
+    modification time are unchanged, so uploaded PDFs are never hashed twice.
+    """
+    stat = os.stat(path)
+    entry = _load_index(_index_path(path)).get(os.path.basename(path))
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["sha256"]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
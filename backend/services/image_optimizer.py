@@ -0,0 +1,169 @@
+import os
+import math
+import statistics
+import fitz  # PyMuPDF
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+OCR_GRAYSCALE = _env_flag("OCR_GRAYSCALE", "true")  # text doesn't need colour
+OCR_CROP_MARGINS = _env_flag("OCR_CROP_MARGINS", "true")  # drop blank margins around the content
+OCR_ADAPTIVE_DPI = _env_flag("OCR_ADAPTIVE_DPI", "false")  # pick the DPI from the detected text size
+OCR_TARGET_TEXT_PX = int(os.getenv("OCR_TARGET_TEXT_PX", "28"))  # rendered height of a text line
+OCR_MIN_DPI = int(os.getenv("OCR_MIN_DPI", "100"))
+OCR_MAX_DPI = int(os.getenv("OCR_MAX_DPI", "300"))
+OCR_MAX_PIXELS = int(os.getenv("OCR_MAX_PIXELS", "0"))  # pixel budget per image, 0 for no limit
+OCR_TILE_DENSE_PAGES = _env_flag("OCR_TILE_DENSE_PAGES", "false")  # split dense pages instead of lowering the DPI
+OCR_DENSE_LINES = int(os.getenv("OCR_DENSE_LINES", "45"))  # text lines that make a page dense
+
+ANALYSIS_DPI = 72  # one pixel per point, so measurements are already in page units
+INK_THRESHOLD = 160  # gray levels below this count as ink
+CROP_PADDING = 12  # points of margin kept around the content
+MIN_LINE_HEIGHT, MAX_LINE_HEIGHT = 3, 72  # ink rows outside this range (points) are rules or pictures
+TILE_OVERLAP = 16  # points shared by neighbouring tiles, so no line is cut in both
+
+
+class PageLayout:
+    """What a low-resolution grayscale render of a page tells about its content."""
+
+    def __init__(self, page: fitz.Page):
+        pix = page.get_pixmap(dpi=ANALYSIS_DPI, colorspace=fitz.csGRAY)
+        ink = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width) < INK_THRESHOLD
+        rows, cols = np.flatnonzero(ink.any(axis=1)), np.flatnonzero(ink.any(axis=0))
+        scale = page.rect.width / pix.width  # points per pixel, in case the page isn't at 72 units per inch
+        if rows.size:
+            x0, y0 = page.rect.x0, page.rect.y0
+            self.content = fitz.Rect(x0 + cols[0] * scale, y0 + rows[0] * scale,
+                                     x0 + (cols[-1] + 1) * scale, y0 + (rows[-1] + 1) * scale)
+        else:
+            self.content = None  # blank page
+
+        # Runs of consecutive ink rows are text lines (or pictures and rules, filtered by height)
+        line_heights = []
+        run = 0
+        for has_ink in list(ink.any(axis=1)) + [False]:
+            if has_ink:
+                run += 1
+                continue
+            if MIN_LINE_HEIGHT <= run * scale <= MAX_LINE_HEIGHT:
+                line_heights.append(run * scale)
+            run = 0
+        self.lines = len(line_heights)
+        self.line_height = statistics.median(line_heights) if line_heights else None
+
+
+class ImageOptimizer:
+    """Render a PDF page into the smallest images that keep its text legible for the OCR model.
+
+    Pages are rendered in grayscale and cropped to their content. With
+    `adaptive_dpi` the resolution is chosen so a text line is about
+    `target_text_px` pixels high, instead of a fixed `dpi`. Images above
+    `max_pixels` are rendered at a lower resolution, down to `min_dpi`, or
+    split into horizontal tiles that each fit the budget: always for dense
+    pages with `tile_dense_pages`, and for any page that would need less
+    than `min_dpi`.
+    Instances only hold settings, so they can be sent to render processes.
+    """
+
+    def __init__(self, dpi: int, image_format: str, image_quality: int, grayscale: bool = OCR_GRAYSCALE,
+                 crop_margins: bool = OCR_CROP_MARGINS, adaptive_dpi: bool = OCR_ADAPTIVE_DPI,
+                 target_text_px: int = OCR_TARGET_TEXT_PX, min_dpi: int = OCR_MIN_DPI, max_dpi: int = OCR_MAX_DPI,
+                 max_pixels: int = OCR_MAX_PIXELS, tile_dense_pages: bool = OCR_TILE_DENSE_PAGES,
+                 dense_lines: int = OCR_DENSE_LINES):
+        self.dpi = dpi
+        self.image_format = image_format
+        self.image_quality = image_quality
+        self.grayscale = grayscale
+        self.crop_margins = crop_margins
+        self.adaptive_dpi = adaptive_dpi
+        self.target_text_px = target_text_px
+        self.min_dpi = min_dpi
+        self.max_dpi = max_dpi
+        self.max_pixels = max_pixels
+        self.tile_dense_pages = tile_dense_pages
+        self.dense_lines = dense_lines
+
+    def parameters(self) -> dict:
+        """Every setting that changes the images, and therefore the OCR text."""
+        return dict(vars(self))
+
+    @property
+    def variant(self) -> str:
+        """Describe the settings besides the DPI, so cached OCR text is tied to them."""
+        variant = f"{self.image_format}:{self.image_quality}"
+        if self.grayscale:
+            variant += ":gray"
+        if self.crop_margins:
+            variant += ":crop"
+        if self.adaptive_dpi:
+            variant += f":text{self.target_text_px}px:{self.min_dpi}-{self.max_dpi}dpi"
+        if self.max_pixels:
+            variant += f":max{self.max_pixels}px:min{self.min_dpi}dpi"
+            if self.tile_dense_pages:
+                variant += f":tiles{self.dense_lines}"
+        return variant
+
+    def choose_dpi(self, layout: PageLayout) -> int:
+        if not self.adaptive_dpi or layout.line_height is None:
+            return self.dpi
+        dpi = self.target_text_px * 72 / layout.line_height
+        return int(min(max(dpi, self.min_dpi), self.max_dpi))
+
+    def plan(self, page: fitz.Page) -> tuple:
+        """Return (dpi, [clip rect per image]) for a page."""
+        needs_layout = self.crop_margins or self.adaptive_dpi or (self.max_pixels and self.tile_dense_pages)
+        layout = PageLayout(page) if needs_layout else None
+        clip = page.rect
+        if self.crop_margins and layout.content is not None:
+            clip = (layout.content + (-CROP_PADDING, -CROP_PADDING, CROP_PADDING, CROP_PADDING)) & page.rect
+        dpi = self.choose_dpi(layout) if layout else self.dpi
+
+        scale = dpi / 72
+        pixels = clip.width * clip.height * scale * scale
+        if not self.max_pixels or pixels <= self.max_pixels:
+            return dpi, [clip]
+
+        if self.tile_dense_pages and layout.lines >= self.dense_lines:
+            tiles = self.tile(clip, dpi)
+            if tiles:
+                return dpi, tiles
+        # Lower the resolution to fit the budget, but not below what stays legible;
+        # if that isn't enough, split the page into tiles at the lowest legible DPI
+        min_dpi = min(self.min_dpi, dpi)
+        budget_dpi = int(dpi * math.sqrt(self.max_pixels / pixels))
+        if budget_dpi >= min_dpi:
+            return budget_dpi, [clip]
+        return min_dpi, self.tile(clip, min_dpi) or [clip]
+
+    def tile(self, clip: fitz.Rect, dpi: int) -> list:
+        """Split `clip` into horizontal tiles within the pixel budget at `dpi`, or [] if they'd be too thin."""
+        scale = dpi / 72
+        # Tall enough tiles to stay within the budget at this DPI, overlapping a little
+        tile_height = self.max_pixels / (clip.width * scale * scale)
+        if tile_height <= 2 * TILE_OVERLAP:
+            return []
+        tiles, top = [], clip.y0
+        while True:
+            bottom = min(top + tile_height, clip.y1)
+            tiles.append(fitz.Rect(clip.x0, top, clip.x1, bottom))
+            if bottom >= clip.y1:
+                return tiles
+            top = bottom - TILE_OVERLAP
+
+    def encode(self, pix: fitz.Pixmap) -> bytes:
+        if self.image_format == "jpeg":
+            return pix.tobytes(output="jpeg", jpg_quality=self.image_quality)
+        return pix.tobytes(output=self.image_format)
+
+    def render(self, doc: fitz.Document, page_num: int) -> list:
+        """Render one page of an open document to a list of encoded images, top to bottom."""
+        page = doc.load_page(page_num)
+        dpi, clips = self.plan(page)
+        colorspace = fitz.csGRAY if self.grayscale else fitz.csRGB
+        return [self.encode(page.get_pixmap(dpi=dpi, colorspace=colorspace, clip=clip)) for clip in clips]
@@ -0,0 +1,155 @@
+import os
+import time
+import uuid
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import Future, ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+JOB_MAX_FINISHED = int(os.getenv("JOB_MAX_FINISHED", "100"))
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation has been requested."""
+
+
+@dataclass
+class Job:
+    """State of one background pipeline run."""
+
+    id: str
+    status: str = "queued"
+    stage: str = "queued"
+    progress: float = 0.0
+    created_at: float = field(default_factory=time.time)
+    started_at: float = None
+    finished_at: float = None
+    result: dict = None
+    error: str = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    future: Future = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def report(self, stage: str, progress: float = None):
+        """Progress callback handed to the pipeline; also the cancellation checkpoint."""
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+        self.stage = stage
+        if progress is not None:
+            self.progress = round(min(max(progress, 0.0), 1.0), 3)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Run pipeline jobs on a worker pool off the event loop.
+
+    Finished jobs are kept for `retention_seconds` and at most `max_finished`
+    of them are retained; older ones are evicted on the next submit/lookup.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, retention_seconds: float = JOB_RETENTION_SECONDS,
+                 max_finished: int = JOB_MAX_FINISHED):
+        self.retention_seconds = retention_seconds
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcq-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, **kwargs) -> Job:
+        """Queue `fn(progress=job.report, **kwargs)` and return the job immediately."""
+        job = Job(id=uuid.uuid4().hex)
+        with self._lock:
+            self._evict()
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job, fn, kwargs)
+        return job
+
+    def _run(self, job: Job, fn, kwargs):
+        if job.cancel_event.is_set():
+            # Cancelled after the executor picked it up, so `future.cancel()` could not stop it
+            job.status = "cancelled"
+            job.stage = "cancelled"
+            job.finished_at = time.time()
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = fn(progress=job.report, **kwargs)
+            job.status = "succeeded"
+            job.stage = "done"
+            job.progress = 1.0
+        except JobCancelled:
+            job.status = "cancelled"
+            job.stage = "cancelled"
+        except Exception as e:
+            job.status = "failed"
+            job.error = getattr(e, "detail", None) or str(e)
+            print(f"⚠️ Job {job.id} failed: {job.error}")
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Job:
+        with self._lock:
+            self._evict()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Job:
+        """Request cancellation; queued jobs never start, running ones stop at the next checkpoint."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            job.status = "cancelled"
+            job.stage = "cancelled"
+            job.finished_at = time.time()
+        return job
+
+    def _evict(self):
+        now = time.time()
+        finished = sorted(
+            (job for job in self._jobs.values() if job.finished),
+            key=lambda job: job.finished_at,
+        )
+        expired = [job for job in finished if now - job.finished_at > self.retention_seconds]
+        overflow = finished[:max(len(finished) - self.max_finished, 0)]
+        for job in expired + overflow:
+            self._jobs.pop(job.id, None)
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            job.cancel_event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Return the process-wide job manager, creating it on first use."""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = JobManager()
+        return _job_manager
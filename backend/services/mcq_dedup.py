@@ -0,0 +1,60 @@
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Cosine similarity above which a new question counts as a repeat (>= 1.0 disables the check)
+MCQ_DEDUP_THRESHOLD = float(os.getenv("MCQ_DEDUP_THRESHOLD", "0.9"))
+
+
+class QuestionDeduplicator:
+    """Reject questions whose embedding is too close to an already accepted one."""
+
+    def __init__(self, threshold: float = MCQ_DEDUP_THRESHOLD, initial_capacity: int = 64):
+        self.threshold = threshold
+        self._vectors = None  # preallocated (capacity, dim) matrix of unit vectors
+        self._count = 0
+        self._initial_capacity = initial_capacity
+        self.stats = {"checked": 0, "rejected": 0, "max_similarity": None}
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold < 1.0
+
+    def _append(self, vector: np.ndarray):
+        if self._vectors is None:
+            self._vectors = np.empty((self._initial_capacity, vector.shape[0]), dtype=np.float32)
+        elif self._count == self._vectors.shape[0]:
+            self._vectors = np.concatenate([self._vectors, np.empty_like(self._vectors)])
+        self._vectors[self._count] = vector
+        self._count += 1
+
+    def seed(self, embeddings):
+        """Remember questions accepted earlier (e.g. already in the question bank) without checking them."""
+        for embedding in embeddings:
+            vector = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            self._append(vector / norm if norm else vector)
+
+    def check_and_add(self, embedding) -> bool:
+        """Return True and remember the question if it is new, False if it is a near-duplicate.
+
+        One vectorized dot product against all accepted questions per check.
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+
+        self.stats["checked"] += 1
+        if self._count:
+            similarity = float(np.max(self._vectors[:self._count] @ vector))
+            previous = self.stats["max_similarity"]
+            self.stats["max_similarity"] = round(similarity if previous is None else max(previous, similarity), 4)
+            if similarity > self.threshold:
+                self.stats["rejected"] += 1
+                return False
+
+        self._append(vector)
+        return True
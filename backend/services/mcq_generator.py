@@ -0,0 +1,197 @@
+import os
+import math
+import asyncio
+from ollama import AsyncClient
+from dotenv import load_dotenv
+from services.mcq_dedup import QuestionDeduplicator
+from services.model_scheduler import OLLAMA_KEEP_ALIVE, get_model_scheduler
+from services.metrics import record_ollama_response, track_ollama_call
+
+load_dotenv()
+
+MCQ_CONCURRENCY = int(os.getenv("MCQ_CONCURRENCY", "4"))  # chat requests in flight at once
+MCQ_REQUEST_TIMEOUT = float(os.getenv("MCQ_REQUEST_TIMEOUT", "120"))  # seconds per chat request
+MCQ_MAX_ATTEMPTS_FACTOR = float(os.getenv("MCQ_MAX_ATTEMPTS_FACTOR", "3"))  # attempts allowed per requested question
+MCQ_OVERPROVISION = int(os.getenv("MCQ_OVERPROVISION", "1"))  # extra requests kept in flight to absorb failures
+MCQ_ITEM_RETRIES = int(os.getenv("MCQ_ITEM_RETRIES", "1"))  # retries on the same chunk after an invalid response
+
+
+class GenerationFailed(Exception):
+    """Raised when no question was accepted because the model requests themselves failed."""
+
+
+class ConcurrentMCQGenerator:
+    """Fill a target number of validated questions with concurrent chat requests.
+
+    Requests cycle through the source chunks; a chunk whose response fails
+    validation is retried up to `item_retries` times before moving on. The number in flight follows the
+    observed acceptance rate so that enough attempts are running to reach the
+    target even when some responses fail validation; once the target is met,
+    surplus requests are cancelled. Each request has a timeout and the total
+    number of attempts is capped so a misbehaving model cannot loop forever.
+
+    With a `deduplicator` and `embedding_model`, every valid item is embedded
+    and rejected if it is a near-duplicate of an accepted one; the rejected
+    slot is refilled from the next source chunk like any failed attempt.
+    """
+
+    def __init__(self, model: str, host: str, concurrency: int = MCQ_CONCURRENCY,
+                 items_per_request: int = 1,
+                 request_timeout: float = MCQ_REQUEST_TIMEOUT,
+                 max_attempts_factor: float = MCQ_MAX_ATTEMPTS_FACTOR,
+                 overprovision: int = MCQ_OVERPROVISION,
+                 item_retries: int = MCQ_ITEM_RETRIES,
+                 response_format: dict = None,
+                 deduplicator: QuestionDeduplicator = None, embedding_model: str = None,
+                 scheduler=None):
+        self.model = model
+        self.scheduler = scheduler or get_model_scheduler()
+        self.host = host
+        self.concurrency = max(1, concurrency)
+        self.items_per_request = max(1, items_per_request)
+        self.request_timeout = request_timeout
+        self.max_attempts_factor = max_attempts_factor
+        self.overprovision = overprovision
+        self.item_retries = item_retries
+        self.response_format = response_format
+        self.deduplicator = deduplicator if deduplicator is not None and deduplicator.enabled else None
+        self.embedding_model = embedding_model
+        self.stats = {}
+
+    def _desired_in_flight(self, remaining: int, accepted: int, completed: int) -> int:
+        # Accepted questions per finished request, starting from the optimistic batch size
+        yield_per_request = accepted / completed if completed else self.items_per_request
+        needed = math.ceil(remaining / max(yield_per_request, 0.1)) + self.overprovision
+        return min(self.concurrency, needed)
+
+    async def _attempt(self, client: AsyncClient, source_index: int, prompt: str):
+        # Waiting for the model's turn doesn't count against the request timeout
+        async with self.scheduler.ause(self.model):
+            with track_ollama_call(self.model, "chat"):
+                response = await asyncio.wait_for(
+                    client.chat(model=self.model, messages=[{"role": "user", "content": prompt}],
+                                format=self.response_format, keep_alive=OLLAMA_KEEP_ALIVE),
+                    timeout=self.request_timeout,
+                )
+        record_ollama_response(self.model, "chat", response)
+        self.stats["prompt_tokens"] += response.get("prompt_eval_count") or 0
+        self.stats["completion_tokens"] += response.get("eval_count") or 0
+        return source_index, (response.get("message", {}).get("content") or "").strip()
+
+    async def _is_new(self, client: AsyncClient, text: str) -> bool:
+        try:
+            async with self.scheduler.ause(self.embedding_model):
+                with track_ollama_call(self.embedding_model, "embed"):
+                    response = await asyncio.wait_for(
+                        client.embed(model=self.embedding_model, input=text, keep_alive=OLLAMA_KEEP_ALIVE),
+                        timeout=self.request_timeout,
+                    )
+        except Exception as e:
+            # Losing a question is worse than an occasional repeat
+            self.stats["dedup_errors"] += 1
+            print(f"⚠️ Could not embed question for de-duplication: {e}")
+            return True
+        # No await between the check and the add, so concurrent completions can't both slip through
+        return self.deduplicator.check_and_add(response["embeddings"][0])
+
+    async def generate(self, sources: list, num_questions: int, build_prompt, validate, on_accept=None,
+                       dedup_text=None, checkpoint=None) -> list:
+        """Return up to `num_questions` validated items.
+
+        `build_prompt(source)` turns a source chunk into a prompt, `validate(text)`
+        returns a parsed item, a list of items (batched prompts) or None, and `on_accept(item, source_index)` is called
+        for every accepted item in acceptance order. `dedup_text(item)` gives the text that
+        is embedded for de-duplication. Fewer items are returned when the attempts
+        run out; `stats["shortfall"]` says how many are missing. `GenerationFailed`
+        is raised instead when nothing was accepted and requests errored or timed out.
+        `checkpoint()` is called before requests are
+        launched and after each one completes; an exception it raises (e.g. a
+        cancelled job) stops the run and cancels the requests still in flight.
+        """
+        max_attempts = max(1, math.ceil(num_questions * self.max_attempts_factor / self.items_per_request))
+        self.stats = {"requested": num_questions, "shortfall": 0, "attempts": 0, "accepted": 0, "invalid": 0, "retries": 0, "duplicates": 0,
+                      "dedup_errors": 0, "errors": 0, "timeouts": 0, "cancelled": 0,
+                      "prompt_tokens": 0, "completion_tokens": 0}
+        accepted = []
+        in_flight = set()
+        next_source = 0
+        completed = 0
+        retry_sources = []  # chunks whose last response was invalid, tried again before new ones
+        retries_used = {}
+
+        client = AsyncClient(host=self.host)
+        try:
+            while len(accepted) < num_questions:
+                if checkpoint is not None:
+                    checkpoint()
+                desired = self._desired_in_flight(num_questions - len(accepted), len(accepted), completed)
+                while len(in_flight) < desired and self.stats["attempts"] < max_attempts:
+                    if retry_sources:
+                        source_index = retry_sources.pop(0)
+                        self.stats["retries"] += 1
+                    else:
+                        source_index = next_source % len(sources)
+                        next_source += 1
+                    prompt = build_prompt(sources[source_index])
+                    in_flight.add(asyncio.create_task(self._attempt(client, source_index, prompt)))
+                    self.stats["attempts"] += 1
+
+                if not in_flight:
+                    print(f"⚠️ Gave up after {self.stats['attempts']} attempts "
+                          f"with {len(accepted)}/{num_questions} questions")
+                    break
+
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                if checkpoint is not None:
+                    checkpoint()
+                for task in done:
+                    completed += 1
+                    try:
+                        source_index, text = task.result()
+                    except asyncio.TimeoutError:
+                        self.stats["timeouts"] += 1
+                        print("⚠️ MCQ request timed out")
+                        continue
+                    except Exception as e:
+                        self.stats["errors"] += 1
+                        print(f"⚠️ MCQ request failed: {e}")
+                        continue
+
+                    items = validate(text) if text else None
+                    if isinstance(items, dict):
+                        items = [items]
+                    if not items:
+                        self.stats["invalid"] += 1
+                        print(f"⚠️ Invalid response for doc {source_index}")
+                        if retries_used.get(source_index, 0) < self.item_retries:
+                            retries_used[source_index] = retries_used.get(source_index, 0) + 1
+                            retry_sources.append(source_index)
+                        continue
+                    for item in items:
+                        if len(accepted) >= num_questions:
+                            break  # surplus that finished together with the last needed one
+                        if self.deduplicator is not None and dedup_text is not None:
+                            if not await self._is_new(client, dedup_text(item)):
+                                self.stats["duplicates"] += 1
+                                print(f"♻️ Rejected near-duplicate question from doc {source_index}")
+                                continue
+                        accepted.append(item)
+                        print(f"✅ Generated Q{len(accepted)}")
+                        if on_accept is not None:
+                            on_accept(item, source_index)
+        finally:
+            for task in in_flight:
+                task.cancel()
+            self.stats["cancelled"] = len(in_flight)
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+        self.stats["accepted"] = len(accepted)
+        self.stats["shortfall"] = max(num_questions - len(accepted), 0)
+        if self.deduplicator is not None:
+            self.stats["dedup"] = dict(self.deduplicator.stats, threshold=self.deduplicator.threshold)
+        if not accepted and (self.stats["errors"] or self.stats["timeouts"]):
+            raise GenerationFailed(f"No questions were generated: {self.stats['errors']} of "
+                                   f"{self.stats['attempts']} requests to {self.model} failed and "
+                                   f"{self.stats['timeouts']} timed out")
+        return accepted
@@ -0,0 +1,71 @@
+import json
+from typing import Literal
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+
+class MCQOptions(BaseModel):
+    """The four answer options of a question."""
+
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    A: str = Field(min_length=1)
+    B: str = Field(min_length=1)
+    C: str = Field(min_length=1)
+    D: str = Field(min_length=1)
+
+
+class MCQ(BaseModel):
+    """One multiple-choice question as returned by the model."""
+
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    question: str = Field(min_length=1)
+    options: MCQOptions
+    correct_answer: Literal["A", "B", "C", "D"]
+    description: str = Field(min_length=1)
+
+
+# JSON schema passed as Ollama's `format` so the model can only emit this shape
+MCQ_JSON_SCHEMA = MCQ.model_json_schema()
+
+
+def mcq_batch_schema(count: int) -> dict:
+    """JSON schema for a response carrying `count` questions in a "questions" list."""
+    return {
+        "type": "object",
+        "properties": {
+            "questions": {"type": "array", "items": MCQ_JSON_SCHEMA, "minItems": count, "maxItems": count},
+        },
+        "required": ["questions"],
+        "$defs": MCQ_JSON_SCHEMA.get("$defs", {}),
+    }
+
+
+def parse_mcq(text: str):
+    """Validate one model response; returns the question as a dict, or None if it doesn't conform."""
+    try:
+        return MCQ.model_validate_json(text).model_dump()
+    except ValidationError:
+        return None
+
+
+def parse_mcq_batch(text: str) -> list:
+    """Split a batched response and validate every question on its own.
+
+    Valid questions are kept even if their siblings fail, so one malformed
+    item doesn't cost the whole call.
+    """
+    try:
+        items = json.loads(text).get("questions")
+    except (json.JSONDecodeError, AttributeError):
+        return []
+    if not isinstance(items, list):
+        return []
+
+    mcqs = []
+    for item in items:
+        try:
+            mcqs.append(MCQ.model_validate(item).model_dump())
+        except ValidationError:
+            continue
+    return mcqs
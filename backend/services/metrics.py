@@ -0,0 +1,187 @@
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+
+# Seconds; covers quick embeddings up to multi-minute OCR/LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+TOKEN_RATE_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+BYTE_BUCKETS = (16e3, 32e3, 64e3, 128e3, 256e3, 512e3, 1e6, 2e6, 4e6, 8e6)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, **extra) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra.items()]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            values = dict(self._values)
+        return super().render() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in sorted(values.items())
+        ]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, such as requests in flight."""
+
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set."""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def render(self) -> list:
+        with self._lock:
+            values = {key: list(data) for key, data in self._values.items()}
+        lines = super().render()
+        for key, data in sorted(values.items()):
+            for bound, count in zip(self.buckets, data):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le=bound)} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le='+Inf')} {data[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {data[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {data[-1]}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+PIPELINE_RUNS = REGISTRY.register(Counter(
+    "qbot_pipeline_runs_total", "Finished pipeline runs by outcome.", ("status",)))
+PIPELINE_RUNS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "qbot_pipeline_runs_in_flight", "Pipeline runs currently executing."))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "qbot_stage_duration_seconds", "Wall time of pipeline stages.", ("stage",)))
+PAGES = REGISTRY.register(Counter(
+    "qbot_pages_total", "Extracted pages by method (native, ocr or cache).", ("method",)))
+PAGE_RENDER_SECONDS = REGISTRY.register(Histogram(
+    "qbot_page_render_seconds", "Time to render and encode one page image for OCR."))
+OCR_IMAGE_BYTES = REGISTRY.register(Histogram(
+    "qbot_ocr_image_bytes", "Encoded image bytes sent to the OCR model per page.", buckets=BYTE_BUCKETS))
+OLLAMA_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "qbot_ollama_request_duration_seconds", "Latency of Ollama API calls.", ("model", "endpoint")))
+OLLAMA_IN_FLIGHT = REGISTRY.register(Gauge(
+    "qbot_ollama_requests_in_flight", "Ollama API calls waiting for a response.", ("model", "endpoint")))
+OLLAMA_ERRORS = REGISTRY.register(Counter(
+    "qbot_ollama_request_errors_total", "Failed Ollama API calls.", ("model", "endpoint", "reason")))
+OLLAMA_TOKENS = REGISTRY.register(Counter(
+    "qbot_ollama_tokens_total", "Prompt and completion tokens reported by Ollama.", ("model", "endpoint", "kind")))
+OLLAMA_EVAL_SECONDS = REGISTRY.register(Counter(
+    "qbot_ollama_eval_seconds_total", "Generation time reported by Ollama (eval_duration).", ("model", "endpoint")))
+OLLAMA_TOKENS_PER_SECOND = REGISTRY.register(Histogram(
+    "qbot_ollama_tokens_per_second", "Completion throughput per call (eval_count / eval_duration).",
+    ("model", "endpoint"), buckets=TOKEN_RATE_BUCKETS))
+
+
+def record_ollama_response(model: str, endpoint: str, response):
+    """Count tokens and throughput from the final fields of an Ollama response."""
+    if response is None:
+        return
+    prompt_tokens = response.get("prompt_eval_count") or 0
+    completion_tokens = response.get("eval_count") or 0
+    eval_seconds = (response.get("eval_duration") or 0) / 1e9
+    if prompt_tokens:
+        OLLAMA_TOKENS.inc(prompt_tokens, model=model, endpoint=endpoint, kind="prompt")
+    if completion_tokens:
+        OLLAMA_TOKENS.inc(completion_tokens, model=model, endpoint=endpoint, kind="completion")
+    if eval_seconds:
+        OLLAMA_EVAL_SECONDS.inc(eval_seconds, model=model, endpoint=endpoint)
+        OLLAMA_TOKENS_PER_SECOND.observe(completion_tokens / eval_seconds, model=model, endpoint=endpoint)
+
+
+def _error_reason(error: BaseException) -> str:
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    return type(error).__name__
+
+
+@contextmanager
+def track_ollama_call(model: str, endpoint: str):
+    """Time a blocking Ollama call and count it as in flight and, if it raises, as an error."""
+    OLLAMA_IN_FLIGHT.inc(model=model, endpoint=endpoint)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:  # cancellations of surplus requests aren't errors
+        OLLAMA_ERRORS.inc(model=model, endpoint=endpoint, reason=_error_reason(e))
+        raise
+    finally:
+        OLLAMA_IN_FLIGHT.dec(model=model, endpoint=endpoint)
+        OLLAMA_REQUEST_SECONDS.observe(time.perf_counter() - start, model=model, endpoint=endpoint)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
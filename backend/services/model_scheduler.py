@@ -0,0 +1,211 @@
+import os
+import time
+import asyncio
+import threading
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Passed to every Ollama call so models stay loaded between pipeline stages (seconds, -1 = forever)
+OLLAMA_KEEP_ALIVE = int(os.getenv("OLLAMA_KEEP_ALIVE", "1800"))
+MODEL_SCHEDULER_MAX_RESIDENT = int(os.getenv("MODEL_SCHEDULER_MAX_RESIDENT", "1"))  # big models that fit at once
+MODEL_SCHEDULER_MAX_BATCH = int(os.getenv("MODEL_SCHEDULER_MAX_BATCH", "256"))  # requests per turn before yielding
+MODEL_SCHEDULER_POLL_INTERVAL = 0.02  # seconds between admission checks for async waiters
+
+
+class ModelScheduler:
+    """Group Ollama calls by model so concurrent runs don't thrash model residency.
+
+    Only one scheduled model is active at a time. Requests for the active model
+    are admitted immediately, while requests for other models wait until it
+    has drained (or has used up `max_batch` admissions while others wait).
+    The model with the most waiters goes next, so e.g. every queued OCR page
+    is processed before the scheduler switches to MCQ generation.
+
+    Small `pinned` models (the embedding model by default) bypass scheduling,
+    since they can stay resident alongside a big model. Load/unload counts
+    are estimated from switches and `max_resident`.
+    """
+
+    def __init__(self, max_resident: int = MODEL_SCHEDULER_MAX_RESIDENT,
+                 max_batch: int = MODEL_SCHEDULER_MAX_BATCH, pinned: tuple = ()):
+        self.max_resident = max(1, max_resident)
+        self.max_batch = max(1, max_batch)
+        self.pinned = set(model for model in pinned if model)
+        self._cond = threading.Condition()
+        self._active_model = None
+        self._active_count = 0
+        self._admitted_in_turn = 0
+        self._waiting = Counter()
+        self._resident = OrderedDict()
+        self.loads = Counter()
+        self.unloads = Counter()
+        self.calls = Counter()
+        self.switches = 0
+        self.wait_seconds = Counter()
+
+    def _others_waiting(self, model) -> bool:
+        return any(count for waiting_model, count in self._waiting.items() if waiting_model != model)
+
+    def _can_enter(self, model) -> bool:
+        # The caller is already counted in self._waiting[model]
+        if self._active_count == 0:
+            if self._active_model in (None, model):
+                return True
+            # An idle model keeps its turn only while work is still queued for it
+            return not self._waiting[self._active_model]
+        if model != self._active_model:
+            return False
+        return self._admitted_in_turn < self.max_batch or not self._others_waiting(model)
+
+    def _enter(self, model):
+        if model != self._active_model:
+            if self._active_model is not None:
+                self.switches += 1
+            self._active_model = model
+            self._admitted_in_turn = 0
+            self._mark_resident(model)
+        self._active_count += 1
+        self._admitted_in_turn += 1
+        self.calls[model] += 1
+
+    def _mark_resident(self, model):
+        if model in self._resident:
+            self._resident.move_to_end(model)
+            return
+        self.loads[model] += 1
+        self._resident[model] = True
+        while len(self._resident) > self.max_resident:
+            evicted, _ = self._resident.popitem(last=False)
+            self.unloads[evicted] += 1
+
+    def _release(self, model):
+        with self._cond:
+            self._active_count -= 1
+            if self._active_count == 0:
+                turn_over = not self._waiting[model] or self._admitted_in_turn >= self.max_batch
+                others = {m: c for m, c in self._waiting.items() if c and m != model}
+                if turn_over and others:
+                    # Hand the turn to the model with the most queued work
+                    next_model = max(others, key=others.get)
+                    self.switches += 1
+                    self._active_model = next_model
+                    self._admitted_in_turn = 0
+                    self._mark_resident(next_model)
+            self._cond.notify_all()
+
+    @contextmanager
+    def use(self, model: str):
+        """Block until `model` may be called, for synchronous callers."""
+        if model in self.pinned:
+            self.calls[model] += 1
+            yield
+            return
+        start = time.perf_counter()
+        with self._cond:
+            self._waiting[model] += 1
+            try:
+                while not self._can_enter(model):
+                    self._cond.wait()
+            finally:
+                self._waiting[model] -= 1
+            self._enter(model)
+        self.wait_seconds[model] += time.perf_counter() - start
+        try:
+            yield
+        finally:
+            self._release(model)
+
+    @asynccontextmanager
+    async def ause(self, model: str):
+        """Async variant of `use` that waits without blocking the event loop."""
+        if model in self.pinned:
+            self.calls[model] += 1
+            yield
+            return
+        start = time.perf_counter()
+        with self._cond:
+            self._waiting[model] += 1
+        try:
+            while True:
+                with self._cond:
+                    if self._can_enter(model):
+                        self._waiting[model] -= 1
+                        self._enter(model)
+                        break
+                await asyncio.sleep(MODEL_SCHEDULER_POLL_INTERVAL)
+        except BaseException:
+            with self._cond:
+                self._waiting[model] -= 1
+                self._cond.notify_all()
+            raise
+        self.wait_seconds[model] += time.perf_counter() - start
+        try:
+            yield
+        finally:
+            self._release(model)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "active_model": self._active_model,
+                "in_flight": self._active_count,
+                "waiting": {model: count for model, count in self._waiting.items() if count},
+                "resident": list(self._resident),
+                "pinned": sorted(self.pinned),
+                "loads": dict(self.loads),
+                "unloads": dict(self.unloads),
+                "switches": self.switches,
+                "calls": dict(self.calls),
+                "wait_seconds": {model: round(seconds, 3) for model, seconds in self.wait_seconds.items()},
+                "keep_alive": OLLAMA_KEEP_ALIVE,
+            }
+
+
+def warm_models(host: str, generate_models: list, embedding_models: list = (), keep_alive: int = OLLAMA_KEEP_ALIVE,
+                scheduler: ModelScheduler = None):
+    """Load models into Ollama ahead of the first request.
+
+    Generative models are loaded with an empty /api/generate call and
+    embedding models with a tiny /api/embed call; both pin `keep_alive`.
+    Loads go through `scheduler` like any other call, so its residency
+    bookkeeping knows about them. Failures are reported and skipped, so a
+    missing model doesn't stop startup.
+    """
+    from ollama import Client
+
+    client = Client(host=host)
+    scheduler = scheduler or get_model_scheduler()
+    warmed = []
+    for model in filter(None, generate_models):
+        try:
+            with scheduler.use(model):
+                client.generate(model=model, keep_alive=keep_alive)
+            warmed.append(model)
+        except Exception as e:
+            print(f"⚠️ Could not warm model {model}: {e}")
+    for model in filter(None, embedding_models):
+        try:
+            with scheduler.use(model):
+                client.embed(model=model, input="warm-up", keep_alive=keep_alive)
+            warmed.append(model)
+        except Exception as e:
+            print(f"⚠️ Could not warm embedding model {model}: {e}")
+    if warmed:
+        print(f"🔥 Warmed models: {', '.join(warmed)}")
+    return warmed
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_model_scheduler() -> ModelScheduler:
+    """Return the process-wide scheduler shared by all pipeline runs."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ModelScheduler(pinned=(os.getenv("EMBEDDING_MODEL"),))
+        return _scheduler
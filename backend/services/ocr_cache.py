@@ -0,0 +1,88 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_CACHE_PATH = os.getenv("OCR_CACHE_PATH", "cache/ocr_cache.sqlite3")
+DEFAULT_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+class OCRCache:
+    """Persistent page-level OCR cache with size-bounded LRU eviction.
+
+    Entries are keyed by the SHA-256 of the PDF bytes, the page index, the OCR
+    model, the render DPI and the image encoding, so a re-upload of the same file hits the cache
+    regardless of its filename.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " key TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_last_access ON pages(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(pdf_hash: str, page_index: int, model: str, dpi: int, variant: str = "") -> str:
+        """Build the cache key for one rendered page."""
+        raw = f"{pdf_hash}:{page_index}:{model}:{dpi}:{variant}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Return cached page text or None, refreshing the entry's LRU position."""
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM pages WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE pages SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, text: str):
+        """Store page text and evict least recently used entries over the size budget."""
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (key, text, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, text, size, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM pages ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for reporting in pipeline results."""
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
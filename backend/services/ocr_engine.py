@@ -0,0 +1,144 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from dotenv import load_dotenv
+from services.model_scheduler import get_model_scheduler
+from services.metrics import OLLAMA_ERRORS, record_ollama_response, track_ollama_call
+
+load_dotenv()
+
+OCR_MAX_IN_FLIGHT = int(os.getenv("OCR_MAX_IN_FLIGHT", "4"))  # concurrent OCR requests per Ollama host
+OCR_QUEUE_SIZE = int(os.getenv("OCR_QUEUE_SIZE", "8"))  # rendered pages waiting for a free OCR slot
+OCR_REQUEST_TIMEOUT = float(os.getenv("OCR_REQUEST_TIMEOUT", "300"))
+
+
+def parse_ocr_hosts(raw: str = None, default_limit: int = OCR_MAX_IN_FLIGHT) -> list:
+    """Parse `OLLAMA_OCR_HOSTS` into (host_url, max_in_flight) pairs.
+
+    The value is a comma-separated list of host URLs, each optionally suffixed
+    with `=N` to override the in-flight limit for that host, e.g.
+    "http://gpu1:11434=8,http://gpu2:11434". Falls back to `OLLAMA_HOST_URL`.
+    """
+    raw = raw if raw is not None else (os.getenv("OLLAMA_OCR_HOSTS") or os.getenv("OLLAMA_HOST_URL") or "")
+    hosts = []
+    for entry in raw.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        url, _, limit = entry.partition("=")
+        hosts.append((url.rstrip("/"), int(limit) if limit else default_limit))
+    if not hosts:
+        raise ValueError("OLLAMA_OCR_HOSTS or OLLAMA_HOST_URL must be set in the environment variables.")
+    return hosts
+
+
+class AsyncOCREngine:
+    """Overlap page rendering and OCR requests through a bounded queue.
+
+    One producer renders pages on a dedicated thread (or, with render workers,
+    collects them from the render processes) while a pool of consumers
+    (`max_in_flight` per Ollama host) sends them to the vision model over a
+    single pooled HTTP client. Results are keyed by page number so callers can
+    reassemble them in page order. Every request also waits for the OCR model's
+    turn in the shared model scheduler.
+    """
+
+    def __init__(self, ocr, hosts: list = None, queue_size: int = OCR_QUEUE_SIZE,
+                 timeout: float = OCR_REQUEST_TIMEOUT, scheduler=None):
+        self.ocr = ocr
+        self.scheduler = scheduler or get_model_scheduler()
+        self.hosts = hosts or parse_ocr_hosts()
+        self.queue_size = queue_size
+        self.timeout = timeout
+
+    async def extract_pages(self, extractor, page_numbers: list, on_page=None) -> dict:
+        """Render and OCR `page_numbers`, returning {page_num: text}.
+
+        `on_page(page_num, text)` is called as soon as each page finishes;
+        the texts are then left to it and not collected in the result.
+        """
+        results = {}
+        if not page_numbers:
+            return results
+
+        total_consumers = sum(limit for _, limit in self.hosts)
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        limits = httpx.Limits(max_connections=total_consumers, max_keepalive_connections=total_consumers)
+
+        # fitz documents are not thread-safe, so all rendering happens on one thread
+        with ThreadPoolExecutor(max_workers=1) as render_executor:
+            async with httpx.AsyncClient(limits=limits, timeout=self.timeout) as client:
+                consumers = [
+                    asyncio.create_task(self._consume(queue, client, host, results, on_page))
+                    for host, limit in self.hosts
+                    for _ in range(limit)
+                ]
+                producer = asyncio.create_task(
+                    self._produce(queue, extractor, page_numbers, render_executor, len(consumers))
+                )
+                tasks = [producer, *consumers]
+                try:
+                    await asyncio.gather(*tasks)
+                except BaseException:
+                    # A failed consumer (e.g. `on_page` raising) must not leave the
+                    # producer blocked on a full queue, and vice versa
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    raise
+
+        return results
+
+    async def _produce(self, queue, extractor, page_numbers, render_executor, consumers: int):
+        loop = asyncio.get_running_loop()
+        pages = extractor.iter_encoded_pages(page_numbers)
+        try:
+            while True:
+                # The bounded queue applies back-pressure, so at most queue_size
+                # encoded pages wait in memory ahead of the in-flight requests
+                item = await loop.run_in_executor(render_executor, next, pages, None)
+                if item is None:
+                    break
+                await queue.put(item)
+        finally:
+            await loop.run_in_executor(render_executor, pages.close)
+        for _ in range(consumers):
+            await queue.put(None)
+
+    async def _consume(self, queue, client, host, results, on_page):
+        url = f"{host}/api/generate"
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            page_num, images = item
+            print(f"\n🔍 Processing Page {page_num + 1} on {host}...")
+            # Tiles of one page are read in order and joined
+            texts = [await self._request(client, url, image_bytes) for image_bytes in images]
+            text = "\n".join(text for text in texts if text)
+            if on_page is not None:
+                on_page(page_num, text)
+            else:
+                results[page_num] = text
+
+    async def _request(self, client, url, image_bytes) -> str:
+        payload = self.ocr.build_payload(self.ocr.encode_image(image_bytes))
+        try:
+            async with self.scheduler.ause(self.ocr.model):
+                with track_ollama_call(self.ocr.model, "generate"):
+                    async with client.stream("POST", url, json=payload) as response:
+                        if response.status_code != 200:
+                            body = await response.aread()
+                            OLLAMA_ERRORS.inc(model=self.ocr.model, endpoint="generate",
+                                              reason=f"http_{response.status_code}")
+                            print(f"⚠️ Ollama API error {response.status_code}: {body.decode('utf-8', 'replace')}")
+                            return ""
+                        fragments = []
+                        async for line in response.aiter_lines():
+                            fragments.append(self.ocr.parse_response_line(line))
+                            record_ollama_response(self.ocr.model, "generate", self.ocr.parse_done_line(line))
+                        return "".join(fragments).strip()
+        except Exception as e:
+            print(f"⚠️ Error extracting text from image: {e}")
+            return ""
@@ -0,0 +1,72 @@
+import os
+import fitz  # PyMuPDF
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EXTRACTION_MODES = ("auto", "ocr", "native")
+DEFAULT_EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "auto")
+
+MIN_NATIVE_CHARS = int(os.getenv("MIN_NATIVE_CHARS", "50"))
+MIN_GLYPH_SANITY = float(os.getenv("MIN_GLYPH_SANITY", "0.9"))
+MAX_IMAGE_COVERAGE = float(os.getenv("MAX_IMAGE_COVERAGE", "0.5"))
+DENSE_TEXT_CHARS = int(os.getenv("DENSE_TEXT_CHARS", "500"))
+
+
+def validate_extraction_mode(mode: str) -> str:
+    """Return the mode if it is supported, otherwise raise ValueError."""
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"Unsupported extraction mode '{mode}'. Use one of: {', '.join(EXTRACTION_MODES)}")
+    return mode
+
+
+class PageClassifier:
+    """Decide per page whether the PDF text layer is good enough to skip OCR."""
+
+    def __init__(self, min_chars: int = MIN_NATIVE_CHARS, min_glyph_sanity: float = MIN_GLYPH_SANITY,
+                 max_image_coverage: float = MAX_IMAGE_COVERAGE, dense_text_chars: int = DENSE_TEXT_CHARS):
+        self.min_chars = min_chars
+        self.min_glyph_sanity = min_glyph_sanity
+        self.max_image_coverage = max_image_coverage
+        self.dense_text_chars = dense_text_chars
+
+    @staticmethod
+    def glyph_sanity(text: str) -> float:
+        """Share of non-whitespace characters that are printable and not replacement glyphs."""
+        glyphs = [ch for ch in text if not ch.isspace()]
+        if not glyphs:
+            return 0.0
+        good = sum(1 for ch in glyphs if ch.isprintable() and ch != "�")
+        return good / len(glyphs)
+
+    @staticmethod
+    def image_coverage(page: fitz.Page) -> float:
+        """Fraction of the page area covered by embedded images (capped at 1.0)."""
+        page_area = abs(page.rect)
+        if not page_area:
+            return 0.0
+        covered = 0.0
+        for info in page.get_image_info():
+            covered += abs(fitz.Rect(info["bbox"]) & page.rect)
+        return min(covered / page_area, 1.0)
+
+    def classify(self, page: fitz.Page) -> dict:
+        """Return the native text plus the metrics and chosen method for one page."""
+        text = page.get_text()
+        char_count = len(text.strip())
+        sanity = self.glyph_sanity(text)
+        coverage = self.image_coverage(page)
+
+        use_native = (
+            char_count >= self.min_chars
+            and sanity >= self.min_glyph_sanity
+            # Image-heavy pages only count as born-digital if they still carry plenty of text
+            and (coverage <= self.max_image_coverage or char_count >= self.dense_text_chars)
+        )
+        return {
+            "method": "native" if use_native else "ocr",
+            "text": text.strip(),
+            "chars": char_count,
+            "glyph_sanity": round(sanity, 3),
+            "image_coverage": round(coverage, 3),
+        }
@@ -0,0 +1,41 @@
+import os
+import json
+
+PAGE_RECORDS_FILE = "pages.jsonl"
+
+
+class PageRecordWriter:
+    """Append extracted pages to a JSONL file, one record per line.
+
+    A record is {"file", "sha256", "page", "method", "text"}. Pages are written
+    as soon as they are extracted, so only the page being written is held in
+    memory, whatever the size of the documents.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pages = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.pages += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_page_records(path: str):
+    """Yield the records of a page file one at a time, in the order they were written."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,93 @@
+import os
+import math
+import time
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OCR_RENDER_WORKERS = int(os.getenv("OCR_RENDER_WORKERS", "0"))  # processes rasterizing pages; 0 or 1 renders in-process
+OCR_RENDER_SHARD_PAGES = int(os.getenv("OCR_RENDER_SHARD_PAGES", "4"))  # consecutive pages rendered per task
+
+
+def iter_shard(pdf_path: str, page_numbers: list, optimizer):
+    """Open the PDF and yield (page_num, images, seconds) for each of `page_numbers`.
+
+    `optimizer` is an `ImageOptimizer`; `images` is the list of encoded images
+    it renders the page to.
+    """
+    with fitz.open(pdf_path) as doc:
+        for page_num in page_numbers:
+            start = time.perf_counter()
+            images = optimizer.render(doc, page_num)
+            yield page_num, images, time.perf_counter() - start
+
+
+def render_shard(pdf_path: str, page_numbers: list, optimizer) -> list:
+    """Worker task: render a run of pages of one PDF in its own process."""
+    return list(iter_shard(pdf_path, page_numbers, optimizer))
+
+
+def shard_pages(pages, shard_size: int = OCR_RENDER_SHARD_PAGES):
+    """Group (pdf_path, page_num) pairs into (pdf_path, [page_num, ...]) runs of at most `shard_size` pages."""
+    current_path, current = None, []
+    for pdf_path, page_num in pages:
+        if current and (pdf_path != current_path or len(current) >= shard_size):
+            yield current_path, current
+            current = []
+        current_path = pdf_path
+        current.append(page_num)
+    if current:
+        yield current_path, current
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_render_pool(workers: int = OCR_RENDER_WORKERS) -> ProcessPoolExecutor:
+    """Return the process-wide render pool with `workers` processes, starting it on first use."""
+    with _pools_lock:
+        if workers not in _pools:
+            # Forking a process that runs API and job threads can copy held locks, so start clean processes
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pools[workers]
+
+
+def iter_rendered_pages(pages, optimizer, workers: int = OCR_RENDER_WORKERS,
+                        shard_size: int = OCR_RENDER_SHARD_PAGES):
+    """Yield (pdf_path, page_num, images, seconds) for (pdf_path, page_num) pairs, in the order given.
+
+    With more than one worker, runs of `shard_size` pages are rendered in a
+    process pool where every task opens its own document, so rasterization
+    uses several cores and doesn't hold this process's GIL. At most two
+    shards per worker are in flight, which bounds the pages held in memory.
+    """
+    if workers <= 1:
+        # One open document per PDF, one page at a time
+        for pdf_path, page_numbers in shard_pages(pages, math.inf):
+            for page_num, images, seconds in iter_shard(pdf_path, page_numbers, optimizer):
+                yield pdf_path, page_num, images, seconds
+        return
+
+    pool = get_render_pool(workers)
+    in_flight = deque()
+    try:
+        for pdf_path, page_numbers in shard_pages(pages, shard_size):
+            in_flight.append((pdf_path, pool.submit(render_shard, pdf_path, page_numbers, optimizer)))
+            if len(in_flight) < 2 * workers:
+                continue
+            pdf_path, future = in_flight.popleft()
+            for page_num, images, seconds in future.result():
+                yield pdf_path, page_num, images, seconds
+        while in_flight:
+            pdf_path, future = in_flight.popleft()
+            for page_num, images, seconds in future.result():
+                yield pdf_path, page_num, images, seconds
+    finally:
+        for _, future in in_flight:
+            future.cancel()
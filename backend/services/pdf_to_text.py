@@ -3,40 +3,83 @@ import os
 import base64
 import json
 import requests
-import shutil
 from dotenv import load_dotenv
+from services.hashing import file_sha256
+from services.ocr_cache import OCRCache
+from services.page_classifier import DEFAULT_EXTRACTION_MODE, PageClassifier, validate_extraction_mode
+from services import page_classifier
+from services.ocr_engine import AsyncOCREngine
+from services.async_utils import run_sync
+from services.model_scheduler import OLLAMA_KEEP_ALIVE, get_model_scheduler
+from services.metrics import (
+    OCR_IMAGE_BYTES,
+    OLLAMA_ERRORS,
+    PAGES,
+    PAGE_RENDER_SECONDS,
+    record_ollama_response,
+    track_ollama_call,
+)
+from services.page_records import PAGE_RECORDS_FILE, PageRecordWriter
+from services.page_renderer import OCR_RENDER_WORKERS, iter_rendered_pages
+from services.image_optimizer import ImageOptimizer
 
 load_dotenv()
 
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))  # higher DPI for better OCR quality
+OCR_IMAGE_FORMAT = os.getenv("OCR_IMAGE_FORMAT", "jpeg")
+OCR_IMAGE_QUALITY = int(os.getenv("OCR_IMAGE_QUALITY", "90"))  # only used for jpeg
+OCR_LOOKAHEAD_PAGES = int(os.getenv("OCR_LOOKAHEAD_PAGES", "64"))  # pages classified ahead of an unfinished OCR page
+IMAGE_FORMATS = ("jpeg", "png")
+OCR_PROMPT = "Extract and return all readable text from this image. Do not add any extra commentary."
+
 class PDFImageExtractor:
-    """Convert PDF pages to images and manage temporary image folder."""
+    """Render PDF pages to encoded images in memory, without temporary files.
+
+    Pages go through an `ImageOptimizer` (grayscale, cropping, DPI and pixel
+    budget, tiles), so one page can become several images. With
+    `render_workers` > 1 pages are rasterized in a pool of processes (see
+    `services.page_renderer`) and still come back in page order.
+    """
 
-    def __init__(self, pdf_path: str, output_folder: str = "pdf_images"):
+    def __init__(self, pdf_path: str, dpi: int = OCR_DPI,
+                 image_format: str = OCR_IMAGE_FORMAT, image_quality: int = OCR_IMAGE_QUALITY,
+                 render_workers: int = OCR_RENDER_WORKERS):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format '{image_format}'. Use one of: {', '.join(IMAGE_FORMATS)}")
         self.pdf_path = pdf_path
-        self.output_folder = output_folder
-
-    def pdf_to_images(self) -> list:
-        """Convert each page of PDF to JPG image and return paths."""
-        doc = fitz.open(self.pdf_path)
-        if not os.path.exists(self.output_folder):
-            os.makedirs(self.output_folder)
-
-        image_paths = []
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            pix = page.get_pixmap(dpi=200)  # higher DPI for better OCR quality
-            image_path = os.path.join(self.output_folder, f"page_{page_num + 1}.jpg")
-            pix.save(image_path)
-            image_paths.append(image_path)
-            print(f"✅ Page {page_num + 1} saved as {image_path}")
-        doc.close()
-        return image_paths
-
-    def cleanup_images(self):
-        """Delete all images from the output folder after extraction."""
-        if os.path.exists(self.output_folder):
-            shutil.rmtree(self.output_folder)
-            print(f"🗑️ Deleted temporary folder: {self.output_folder}")
+        self.dpi = dpi
+        self.image_format = image_format
+        self.image_quality = image_quality
+        self.render_workers = render_workers
+        self.optimizer = ImageOptimizer(dpi, image_format, image_quality)
+        self.page_images = {}  # page_num -> {"images", "image_bytes"} of rendered pages not yet collected
+
+    @property
+    def variant(self) -> str:
+        """Describe the encoding settings, so cached OCR text is tied to them."""
+        return self.optimizer.variant
+
+    def page_count(self) -> int:
+        """Return the number of pages in the PDF."""
+        with fitz.open(self.pdf_path) as doc:
+            return len(doc)
+
+    def iter_encoded_pages(self, page_numbers: list = None):
+        """Yield (page_num, images) one page at a time, in order.
+
+        Only the pages in `page_numbers` (0-based) are rendered when given.
+        Nothing touches the disk; in-process only the page being yielded is
+        held in memory, with a render pool a few shards ahead of it.
+        """
+        if page_numbers is None:
+            page_numbers = range(self.page_count())
+        pages = ((self.pdf_path, page_num) for page_num in page_numbers)
+        for _, page_num, images, seconds in iter_rendered_pages(pages, self.optimizer, workers=self.render_workers):
+            PAGE_RENDER_SECONDS.observe(seconds)
+            image_bytes = sum(len(image) for image in images)
+            OCR_IMAGE_BYTES.observe(image_bytes)
+            self.page_images[page_num] = {"images": len(images), "image_bytes": image_bytes}
+            yield page_num, images
 
 
 class GemmaOCR:
@@ -46,39 +89,65 @@ class GemmaOCR:
         self.model = model or os.getenv("OCR_MODEL")
         self.ollama_url = ollama_url or os.getenv("OLLAMA_HOST_URL") + "/api/generate"
 
-    def encode_image(self, image_path: str) -> str:
-        """Convert image file to base64 string."""
-        with open(image_path, "rb") as f:
-            return base64.b64encode(f.read()).decode("utf-8")
+    def encode_image(self, image_bytes: bytes) -> str:
+        """Convert encoded image bytes to a base64 string."""
+        return base64.b64encode(image_bytes).decode("utf-8")
 
-    def extract_text_from_image(self, image_path: str) -> str:
-        """Send image to Gemma3 for OCR-like extraction."""
-        image_b64 = self.encode_image(image_path)
-
-        payload = {
+    def build_payload(self, image_b64: str) -> dict:
+        """Build the /api/generate request body for one page image."""
+        return {
             "model": self.model,
-            "prompt": "Extract and return all readable text from this image. Do not add any extra commentary.",
-            "images": [image_b64]
+            "prompt": OCR_PROMPT,
+            "images": [image_b64],
+            "keep_alive": OLLAMA_KEEP_ALIVE,
         }
 
+    @staticmethod
+    def parse_response_line(line) -> str:
+        """Return the text fragment carried by one streamed response line."""
+        if not line:
+            return ""
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            return ""  # skip malformed lines
+        return data.get("response") or data.get("content") or ""
+
+    @staticmethod
+    def parse_done_line(line):
+        """Return the last line of a streamed response, which carries eval_count/eval_duration, else None."""
+        if not line:
+            return None
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if '"done":true' not in line.replace(" ", ""):
+            return None
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            return None
+
+    def extract_text_from_image(self, image_bytes: bytes) -> str:
+        """Send image to Gemma3 for OCR-like extraction."""
+        payload = self.build_payload(self.encode_image(image_bytes))
+
         try:
-            # Stream the response to handle multiple JSON objects
-            response = requests.post(self.ollama_url, json=payload, stream=True)
-            if response.status_code != 200:
-                print(f"⚠️ Ollama API error {response.status_code}: {response.text}")
-                return ""
-
-            extracted_text = ""
-            for line in response.iter_lines():
-                if not line:
-                    continue
-                try:
-                    data = json.loads(line.decode("utf-8"))
-                    extracted_text += data.get("response") or data.get("content") or ""
-                except json.JSONDecodeError:
-                    continue  # skip malformed lines
-
-            return extracted_text.strip()
+            with get_model_scheduler().use(self.model), track_ollama_call(self.model, "generate"):
+                # Stream the response to handle multiple JSON objects
+                response = requests.post(self.ollama_url, json=payload, stream=True)
+                if response.status_code != 200:
+                    OLLAMA_ERRORS.inc(model=self.model, endpoint="generate", reason=f"http_{response.status_code}")
+                    print(f"⚠️ Ollama API error {response.status_code}: {response.text}")
+                    return ""
+
+                fragments = []
+                for line in response.iter_lines():
+                    fragments.append(self.parse_response_line(line))
+                    record_ollama_response(self.model, "generate", self.parse_done_line(line))
+
+            return "".join(fragments).strip()
 
         except Exception as e:
             print(f"⚠️ Error extracting text from image: {e}")
@@ -86,32 +155,163 @@ class GemmaOCR:
 
 
 class PDFProcessor:
-    """Full pipeline for processing PDF into text using Gemma OCR."""
+    """Full pipeline for processing PDF into text, using Gemma OCR only where needed."""
 
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, cache: OCRCache = None, extraction_mode: str = DEFAULT_EXTRACTION_MODE,
+                 pdf_hash: str = None, lookahead: int = OCR_LOOKAHEAD_PAGES):
         self.pdf_path = pdf_path
+        self.lookahead = max(1, lookahead)
+        self.pdf_hash = pdf_hash
         self.extractor = PDFImageExtractor(pdf_path)
         self.gemma_ocr = GemmaOCR()
+        self.ocr_engine = AsyncOCREngine(self.gemma_ocr)
+        self.cache = cache
+        self.extraction_mode = validate_extraction_mode(extraction_mode)
+        self.classifier = PageClassifier()
+        self.page_report = []
+
+    def iter_classified_pages(self):
+        """Yield one report entry per page with the extraction method to use."""
+        with fitz.open(self.pdf_path) as doc:
+            for page_num in range(len(doc)):
+                page = doc.load_page(page_num)
+                if self.extraction_mode == "ocr":
+                    report = {"method": "ocr", "text": None}
+                elif self.extraction_mode == "native":
+                    report = {"method": "native", "text": page.get_text().strip()}
+                else:
+                    report = self.classifier.classify(page)
+                yield {"page": page_num + 1, **report}
+
+    def stream_pages(self, write_page, progress=None) -> int:
+        """Extract every page and hand its record to `write_page(record)`, in page order.
+
+        Pages with a usable text layer are read directly. Pages already present
+        in the OCR cache are neither rendered nor sent to the vision model.
+        A page is handed over as soon as it and every page before it are done.
+        Pages needing OCR are sent in windows: once `lookahead` pages have
+        been classified since the first one still waiting for OCR, the window
+        is OCR'd before classification goes on, so at most `lookahead` pages
+        are buffered whatever the document size.
+        `progress(fraction)` is called whenever a page is done; an exception it
+        raises (e.g. a cancelled job) stops the extraction. Returns the number
+        of pages.
+        """
+        file_name = os.path.basename(self.pdf_path)
+        if self.pdf_hash is None:
+            self.pdf_hash = file_sha256(self.pdf_path)
+        self.page_report = []
+        cache_keys = {}
+        missing_pages = []  # OCR pages of the current window
+        ocr_count = 0
+        pending = {}  # page_num -> text, until every earlier page has been written
+        next_page = 0
+        total_pages = self.extractor.page_count()
+        done_pages = 0
+
+        def page_done():
+            nonlocal done_pages
+            done_pages += 1
+            if progress is not None:
+                progress(done_pages / total_pages)
+
+        def flush():
+            nonlocal next_page
+            while next_page in pending:
+                report = self.page_report[next_page]
+                write_page({"file": file_name, "sha256": self.pdf_hash, "page": report["page"],
+                            "method": report["method"], "text": pending.pop(next_page)})
+                next_page += 1
+
+        def on_page(page_num, page_text):
+            # Empty text usually means the OCR request failed, so don't pin it in the cache
+            if not page_text:
+                self.page_report[page_num]["ocr_failed"] = True
+            elif self.cache is not None:
+                self.cache.put(cache_keys[page_num], page_text)
+            # What was sent to the OCR model for this page
+            self.page_report[page_num].update(self.extractor.page_images.pop(page_num, {}))
+            pending[page_num] = page_text
+            flush()
+            page_done()
+
+        def run_ocr():
+            run_sync(self.ocr_engine.extract_pages(self.extractor, missing_pages, on_page=on_page))
+            missing_pages.clear()
+
+        for report in self.iter_classified_pages():
+            page_num = report["page"] - 1
+            text = report.pop("text")
+            if report["method"] == "ocr" and self.cache is not None:
+                cache_keys[page_num] = OCRCache.make_key(
+                    self.pdf_hash, page_num, self.gemma_ocr.model, self.extractor.dpi, self.extractor.variant
+                )
+                text = self.cache.get(cache_keys[page_num])
+                if text is not None:
+                    report["method"] = "cache"
+            self.page_report.append(report)
+            if report["method"] == "ocr":
+                missing_pages.append(page_num)
+                ocr_count += 1
+            else:
+                pending[page_num] = text
+                flush()
+                page_done()
+            if missing_pages and page_num - missing_pages[0] + 1 >= self.lookahead:
+                run_ocr()
+
+        if missing_pages:
+            run_ocr()
+
+        for report in self.page_report:
+            PAGES.inc(method=report["method"])
+        native_count = sum(1 for report in self.page_report if report["method"] == "native")
+        print(f"📑 {self.pdf_path}: {native_count} native, {ocr_count} OCR, "
+              f"{len(self.page_report) - native_count - ocr_count} cached pages")
+        if ocr_count:
+            sent = sum(report.get("image_bytes", 0) for report in self.page_report)
+            print(f"🖼️ Sent {sent / 1024:.0f} KB of page images to OCR ({sent / 1024 / ocr_count:.0f} KB/page)")
+        return len(self.page_report)
+
+
+def list_pdfs(upload_folder: str) -> list:
+    """Names of the PDFs in a folder, in the order they are extracted."""
+    return sorted(f for f in os.listdir(upload_folder) if f.endswith(".pdf"))
+
+
+def extraction_parameters(extraction_mode: str = DEFAULT_EXTRACTION_MODE) -> dict:
+    """Everything besides the PDFs themselves that changes the extracted text."""
+    return {
+        "extraction_mode": extraction_mode,
+        "ocr_model": os.getenv("OCR_MODEL"),
+        "ocr_prompt": OCR_PROMPT,
+        **ImageOptimizer(OCR_DPI, OCR_IMAGE_FORMAT, OCR_IMAGE_QUALITY).parameters(),
+        "min_native_chars": page_classifier.MIN_NATIVE_CHARS,
+        "min_glyph_sanity": page_classifier.MIN_GLYPH_SANITY,
+        "max_image_coverage": page_classifier.MAX_IMAGE_COVERAGE,
+        "dense_text_chars": page_classifier.DENSE_TEXT_CHARS,
+        "output": PAGE_RECORDS_FILE,
+    }
+
+
+def save_page_records_from_pdfs(upload_folder: str = "upload",
+                                output_file: str = f"output/{PAGE_RECORDS_FILE}",
+                                cache: OCRCache = None,
+                                extraction_mode: str = DEFAULT_EXTRACTION_MODE,
+                                progress=None) -> dict:
+    """
+    Process all PDFs from the upload folder and stream their pages to a JSONL file.
 
-    def process_pdf(self) -> str:
-        """Full pipeline: PDF -> images -> Gemma OCR -> combined text."""
-        image_paths = self.extractor.pdf_to_images()
-        all_text = ""
-
-        for idx, image_path in enumerate(image_paths):
-            print(f"\n🔍 Processing Page {idx + 1}...")
-            page_text = self.gemma_ocr.extract_text_from_image(image_path)
-            all_text += f"\n\n--- Page {idx + 1} ---\n{page_text}"
-
-        # Clean up temporary images
-        self.extractor.cleanup_images()
-        return all_text
+    Every page is appended to `output_file` as soon as it is extracted (see
+    `PageRecordWriter`), so memory use doesn't grow with the number of pages.
 
+    `extraction_mode` is one of "auto" (text layer where usable, OCR otherwise),
+    "ocr" (always OCR) or "native" (text layer only). `progress(fraction)` is
+    called after each page and each PDF. Returns the OCR cache hit/miss counts, the per-page
+    extraction report, the processed documents with their SHA-256 and the
+    pages for which OCR failed or returned no text."""
+    validate_extraction_mode(extraction_mode)
 
-def save_combined_text_from_pdfs(upload_folder: str = "upload", 
-                                 output_file: str = "output/combined_output.txt"):
-    """
-    Process all PDFs from the upload folder and save the combined extracted text to a file."""
     # Ensure upload folder exists
     os.makedirs(upload_folder, exist_ok=True)
 
@@ -119,43 +319,48 @@ def save_combined_text_from_pdfs(upload_folder: str = "upload",
         print(f"⚠️ Upload folder '{upload_folder}' not found.")
         return
 
-    pdf_files = [f for f in os.listdir(upload_folder) if f.endswith(".pdf")]
+    pdf_files = list_pdfs(upload_folder)
     if not pdf_files:
         print(f"⚠️ No PDF files found in '{upload_folder}'")
         return
 
-    all_extracted_text = ""
-
-    # Process each PDF file
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(upload_folder, pdf_file)
-        print(f"\n📄 Processing PDF: {pdf_path}")
-        processor = PDFProcessor(pdf_path)
-        extracted_text = processor.process_pdf()
-        all_extracted_text += f"\n\n--- Extracted from {pdf_file} ---\n{extracted_text}"
-
-    # Ensure the output folder exists before writing
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(all_extracted_text)
-
-    print(f"\n✅ Extraction Complete! All text saved to {output_file}")
-
-    # Process each PDF file
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(upload_folder, pdf_file)
-        print(f"\n📄 Processing PDF: {pdf_path}")
-        processor = PDFProcessor(pdf_path)
-        extracted_text = processor.process_pdf()
-        all_extracted_text += f"\n\n--- Extracted from {pdf_file} ---\n{extracted_text}"
-
-    # Save all extracted text into one file
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(all_extracted_text)
-
-    print(f"\n✅ Extraction Complete! All text saved to {output_file}")
+    owns_cache = cache is None
+    if owns_cache:
+        cache = OCRCache()
+
+    page_reports = {}
+    documents = []
+    ocr_failures = []
+
+    try:
+        with PageRecordWriter(output_file) as writer:
+            # Process each PDF file
+            for idx, pdf_file in enumerate(pdf_files):
+                pdf_path = os.path.join(upload_folder, pdf_file)
+                print(f"\n📄 Processing PDF: {pdf_path}")
+                pdf_hash = file_sha256(pdf_path)
+                documents.append({"file": pdf_file, "sha256": pdf_hash, "uploaded_at": os.path.getmtime(pdf_path)})
+                processor = PDFProcessor(pdf_path, cache=cache, extraction_mode=extraction_mode, pdf_hash=pdf_hash)
+                processor.stream_pages(
+                    writer.write,
+                    progress=None if progress is None else lambda fraction: progress((idx + fraction) / len(pdf_files)),
+                )
+                page_reports[pdf_file] = processor.page_report
+                ocr_failures.extend({"file": pdf_file, "page": report["page"]}
+                                    for report in processor.page_report if report.get("ocr_failed"))
+                if progress is not None:
+                    progress((idx + 1) / len(pdf_files))
+        cache_stats = cache.stats()
+    finally:
+        if owns_cache:
+            cache.close()
+
+    print(f"\n✅ Extraction Complete! {writer.pages} pages saved to {output_file}")
+    print(f"📊 OCR cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+    if ocr_failures:
+        print(f"⚠️ OCR returned no text for {len(ocr_failures)} pages")
+    return {"ocr_cache": cache_stats, "pages": page_reports, "documents": documents, "ocr_failures": ocr_failures}
 
 
 if __name__ == "__main__":
-    save_combined_text_from_pdfs()
+    save_page_records_from_pdfs()
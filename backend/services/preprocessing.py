@@ -1,20 +1,38 @@
 import os
+import json
+import time
 from fastapi import HTTPException
 # from text_to_mcq import TextToMCQ  # Import the text_to_mcq.py class
 # from mcq_txt_to_json import MCQTextToJSON  # Import the mcq_txt_to_json.py class
 # from pdf_to_text import save_combined_text_from_pdfs  # Assuming this function is already available
 
-from services.text_to_mcq import TextToMCQ
-from services.mcq_txt_to_json import MCQTextToJSON
-from services.pdf_to_text import save_combined_text_from_pdfs
+from services.text_to_mcq import NoExtractableText, TextToMCQ, generation_parameters
+from services.mcq_generator import GenerationFailed
+from services.pdf_to_text import extraction_parameters, list_pdfs, save_page_records_from_pdfs
+from services.page_records import PAGE_RECORDS_FILE, iter_page_records
+from services.hashing import file_sha256
+from services.stage_cache import StageCache, fingerprint
+from services.page_classifier import DEFAULT_EXTRACTION_MODE
+from services.jobs import JobCancelled
+from services.workspace import RunWorkspace, WorkspaceQuotaExceeded, prune_workspaces
+from services.question_bank import get_question_bank
+from services.metrics import PIPELINE_RUNS, PIPELINE_RUNS_IN_FLIGHT, STAGE_SECONDS
 
 
 class PreprocessingPipeline:
     """Class to manage the preprocessing pipeline of PDF to MCQs."""
     
-    def __init__(self, upload_folder="upload", output_folder="output"):
+    def __init__(self, upload_folder="upload", output_folder="output", extraction_mode=DEFAULT_EXTRACTION_MODE,
+                 work_folder=None, check_quota=None, stage_cache=None, question_bank=None, extend_bank=False):
         self.upload_folder = upload_folder
         self.output_folder = output_folder
+        # Intermediates go next to the results unless the run has its own workspace
+        self.work_folder = work_folder or output_folder
+        self.extraction_mode = extraction_mode
+        self.check_quota = check_quota or (lambda: None)
+        self.stage_cache = stage_cache
+        self.question_bank = question_bank
+        self.extend_bank = extend_bank
 
     # def extract_and_generate_mcqs(self, num_questions=10):
     #     """Full pipeline: PDF -> Text -> MCQs -> JSON."""
@@ -50,46 +68,179 @@ class PreprocessingPipeline:
 
     #     return {"message": "MCQs generation complete", "output_file": f"{self.output_folder}/mcqs.json"}
 
-    def extract_and_generate_mcqs(self, num_questions=10):
+    def extract_and_generate_mcqs(self, num_questions=10, progress=None, on_mcq=None):
+        """Run extract -> generate; questions are validated and saved as JSON while generating.
+
+        `progress(stage, fraction)` is called between steps and `on_mcq(mcq)`
+        with every question as soon as it has been generated and parsed.
+        With a `stage_cache`, a stage whose inputs and parameters are unchanged
+        since an earlier run is skipped and its stored output is used instead.
+        """
+        progress = progress or (lambda stage, fraction=None: None)
+        stage_cache = self.stage_cache or StageCache(enabled=False)
+        stages = {}
+        timings = {}
+        started = time.perf_counter()
+
+        def extraction_progress(fraction):
+            self.check_quota()
+            progress("extracting", 0.5 * fraction)
+
+        progress("extracting", 0.0)
         try:
             # Step 1: Extract text from PDFs
-            save_combined_text_from_pdfs(upload_folder=self.upload_folder, output_file=f"{self.output_folder}/combined_output.txt")
+            extract_inputs = {
+                "documents": [[name, file_sha256(os.path.join(self.upload_folder, name))]
+                              for name in list_pdfs(self.upload_folder)],
+                **extraction_parameters(self.extraction_mode),
+            }
+            extract_key = fingerprint(extract_inputs)
+            extraction_stats = stage_cache.load("extract", extract_key, self.work_folder)
+            stages["extract"] = {"fingerprint": extract_key, "cached": extraction_stats is not None}
+            if extraction_stats is not None:
+                extraction_stats["ocr_cache"] = {"hits": 0, "misses": 0}  # no page was looked at this time
+            else:
+                extraction_stats = save_page_records_from_pdfs(
+                    upload_folder=self.upload_folder,
+                    output_file=f"{self.work_folder}/{PAGE_RECORDS_FILE}",
+                    extraction_mode=self.extraction_mode,
+                    progress=extraction_progress,
+                ) or {}
+                # Pages OCR failed on would otherwise be served empty until the stage is refreshed
+                if extraction_stats and not extraction_stats.get("ocr_failures"):
+                    stage_cache.store("extract", extract_key, extract_inputs, self.work_folder,
+                                      [PAGE_RECORDS_FILE], extraction_stats)
+            self.check_quota()
+            timings["extract"] = time.perf_counter() - started
+        except (JobCancelled, WorkspaceQuotaExceeded):
+            raise
         except FileNotFoundError as e:
             raise HTTPException(status_code=500, detail=f"PDF file not found in {self.upload_folder}: {str(e)}")
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error extracting text from PDFs: {str(e)}")
 
-        try:
-            # Step 2: Generate MCQs from the extracted text
-            txt_file = f"{self.output_folder}/combined_output.txt"
-            if not os.path.exists(txt_file):
-                raise FileNotFoundError(f"Text extraction failed. {txt_file} does not exist.")
-            with open(txt_file, "r", encoding="utf-8") as f:
-                extracted_text = f.read()
+        progress("generating", 0.5)
+        generated = []
 
-            # Process MCQs
-            text_to_mcq_processor = TextToMCQ(extracted_text, output_folder=self.output_folder)
-            text_to_mcq_processor.process(num_questions=num_questions)
+        def generation_progress():
+            progress("generating", 0.5 + 0.5 * min(len(generated) / num_questions, 1.0))
 
+        def handle_mcq(mcq):
+            generated.append(mcq)
+            if on_mcq is not None:
+                on_mcq(mcq)
+            generation_progress()
+
+        generate_started = time.perf_counter()
+        try:
+            # Step 2: Generate MCQs from the extracted text
+            pages_file = f"{self.work_folder}/{PAGE_RECORDS_FILE}"
+            if not os.path.exists(pages_file):
+                raise FileNotFoundError(f"Text extraction failed. {pages_file} does not exist.")
+
+            generate_inputs = {"extract": extract_key, **generation_parameters(num_questions)}
+            generate_key = fingerprint(generate_inputs)
+            generation = stage_cache.load("generate", generate_key, self.output_folder)
+            stages["generate"] = {"fingerprint": generate_key, "cached": generation is not None}
+            if generation is not None:
+                with open(f"{self.output_folder}/generated_question.json", "r", encoding="utf-8") as f:
+                    mcqs = json.load(f)
+                for mcq in mcqs:
+                    handle_mcq(mcq)
+                timings["generate"] = time.perf_counter() - generate_started
+            else:
+                # Process MCQs, reading the extracted pages lazily
+                text_to_mcq_processor = TextToMCQ(iter_page_records(pages_file), output_folder=self.output_folder,
+                                                  documents=extraction_stats.get("documents"),
+                                                  question_bank=self.question_bank,
+                                                  extend_bank=self.extend_bank)
+                text_to_mcq_processor.process(num_questions=num_questions, on_mcq=handle_mcq,
+                                              checkpoint=generation_progress)
+                mcqs = text_to_mcq_processor.mcqs
+                timings.update(text_to_mcq_processor.timings)
+                generation = {"embedding": text_to_mcq_processor.embedding_stats,
+                              "generation": text_to_mcq_processor.generation_stats}
+                # A short list means generation gave up, and questions from pages OCR failed on are
+                # keyed like the complete text would be; either way the next run should try again.
+                # Questions that extend the bank depend on its contents, which aren't fingerprinted.
+                complete = len(mcqs) >= num_questions and not extraction_stats.get("ocr_failures")
+                if complete and not self.extend_bank:
+                    stage_cache.store("generate", generate_key, generate_inputs, self.output_folder,
+                                      ["generated_question.json"], generation)
+            self.check_quota()
+
+        except (JobCancelled, WorkspaceQuotaExceeded):
+            raise
+        except NoExtractableText as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except GenerationFailed as e:
+            raise HTTPException(status_code=502, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error generating MCQs: {str(e)}")
 
-        # Convert raw MCQs to JSON
-        try:
-            raw_mcq_file = f"{self.output_folder}/generated_question.txt"
-            mcq_json_processor = MCQTextToJSON(raw_mcq_file, output_folder=self.output_folder)
-            mcq_json_processor.process()
+        for stage, seconds in timings.items():
+            STAGE_SECONDS.observe(seconds, stage=stage)
 
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error converting MCQs to JSON: {str(e)}")
+        shortfall = max(num_questions - len(mcqs), 0)
+        if shortfall:
+            print(f"⚠️ Generated {len(mcqs)} of {num_questions} requested questions")
 
-        return {"message": "MCQs generation complete", "output_file": f"{self.output_folder}/mcqs.json"}
+        return {
+            "message": ("MCQs generation complete" if not shortfall else
+                        f"MCQs generation incomplete: {len(mcqs)} of {num_questions} questions generated"),
+            "requested": num_questions,
+            "shortfall": shortfall,
+            "output_file": f"{self.output_folder}/generated_question.json",
+            "mcqs": mcqs,
+            "ocr_cache": extraction_stats.get("ocr_cache", {"hits": 0, "misses": 0}),
+            "pages": extraction_stats.get("pages", {}),
+            "ocr_failures": extraction_stats.get("ocr_failures", []),
+            "embedding": generation["embedding"],
+            "generation": generation["generation"],
+            "stages": stages,
+            "timings": {**{name: round(seconds, 3) for name, seconds in timings.items()},
+                        "total": round(time.perf_counter() - started, 3)},
+        }
 
 
 
 # Utility function to run preprocessing from outside (like from an API endpoint)
-def generate_mcqs_pipeline():
-    """Function to start the entire MCQs generation pipeline."""
-    pipeline = PreprocessingPipeline(upload_folder="upload", output_folder="output")
-    result = pipeline.extract_and_generate_mcqs(num_questions=10)  # You can adjust num_questions here
-    return result
+def generate_mcqs_pipeline(extraction_mode=None, num_questions=10, progress=None, on_mcq=None,
+                           upload_folder="upload", refresh=False, pdf_paths=None, extend_bank=False):
+    """Function to start the entire MCQs generation pipeline.
+
+    Every call runs in its own workspace (see `RunWorkspace`), so several runs
+    can execute at the same time. Stages are memoized across runs; `refresh`
+    is True to run all of them again or a list of stage names. `pdf_paths`
+    limits the run to those PDFs instead of everything in `upload_folder`.
+    Generated questions are added to the question bank; with `extend_bank`
+    only questions it doesn't have yet (see `TextToMCQ`).
+    """
+    extraction_mode = extraction_mode or DEFAULT_EXTRACTION_MODE
+    if refresh is True:
+        refresh = ("extract", "generate")
+    prune_workspaces()
+    with RunWorkspace() as workspace:
+        if pdf_paths is not None:
+            workspace.snapshot_files(pdf_paths)
+        else:
+            workspace.snapshot_inputs(upload_folder)
+        pipeline = PreprocessingPipeline(upload_folder=workspace.input_folder, output_folder=workspace.results_folder,
+                                         extraction_mode=extraction_mode, work_folder=workspace.work_folder,
+                                         check_quota=workspace.check_quota,
+                                         stage_cache=StageCache(refresh=tuple(refresh or ())),
+                                         question_bank=get_question_bank(), extend_bank=extend_bank)
+        PIPELINE_RUNS_IN_FLIGHT.inc()
+        status = "failed"
+        try:
+            result = pipeline.extract_and_generate_mcqs(num_questions=num_questions, progress=progress, on_mcq=on_mcq)
+            status = "succeeded"
+        except JobCancelled:
+            status = "cancelled"
+            raise
+        except WorkspaceQuotaExceeded as e:
+            raise HTTPException(status_code=507, detail=str(e))  # Insufficient Storage
+        finally:
+            PIPELINE_RUNS_IN_FLIGHT.dec()
+            PIPELINE_RUNS.inc(status=status)
+    return {"run_id": workspace.run_id, **result}
@@ -0,0 +1,143 @@
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", "cache/question_bank.sqlite3")
+QUESTION_BANK_LOW_WATERMARK = int(os.getenv("QUESTION_BANK_LOW_WATERMARK", "20"))  # refill below this many
+QUESTION_BANK_REFILL_SIZE = int(os.getenv("QUESTION_BANK_REFILL_SIZE", "20"))  # questions generated per refill
+SAMPLE_MODES = ("random", "unseen")
+
+
+def question_key(question: str) -> str:
+    """Hash of the normalized question text, so the same question is only stored once per document."""
+    normalized = re.sub(r"\s+", " ", question).strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class QuestionBank:
+    """Persistent store of generated MCQs, indexed by document hash.
+
+    Every question keeps the document and chunk it was generated from and the
+    model that wrote it. Questions already served to a client are tracked, so
+    quizzes can be drawn from questions that client hasn't seen yet.
+    """
+
+    def __init__(self, db_path: str = QUESTION_BANK_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS questions ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " doc_hash TEXT NOT NULL,"
+            " chunk_id TEXT,"
+            " model TEXT,"
+            " question_key TEXT NOT NULL,"
+            " mcq TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " UNIQUE (doc_hash, question_key));"
+            "CREATE INDEX IF NOT EXISTS idx_questions_doc_model ON questions(doc_hash, model);"
+            "CREATE TABLE IF NOT EXISTS seen ("
+            " client_id TEXT NOT NULL,"
+            " question_id INTEGER NOT NULL,"
+            " served_at REAL NOT NULL,"
+            " PRIMARY KEY (client_id, question_id));"
+        )
+        self._conn.commit()
+
+    def add(self, doc_hash: str, chunk_id: str, model: str, mcq: dict) -> bool:
+        """Store one question; returns False if the document already has it."""
+        mcq = {key: value for key, value in mcq.items() if key != "question_no"}
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO questions (doc_hash, chunk_id, model, question_key, mcq, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_hash, chunk_id, model, question_key(mcq["question"]), json.dumps(mcq), time.time()),
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def questions(self, doc_hash: str) -> list:
+        """(chunk_id, question text) of every question stored for a document, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id, mcq FROM questions WHERE doc_hash = ? ORDER BY id", (doc_hash,)
+            ).fetchall()
+        return [(chunk, json.loads(mcq)["question"]) for chunk, mcq in rows]
+
+    def _filters(self, doc_hash: str, model: str = None, unseen_by: str = None):
+        where, params = ["doc_hash = ?"], [doc_hash]
+        if model:
+            where.append("model = ?")
+            params.append(model)
+        if unseen_by is not None:
+            where.append("id NOT IN (SELECT question_id FROM seen WHERE client_id = ?)")
+            params.append(unseen_by)
+        return " AND ".join(where), params
+
+    def sample(self, doc_hash: str, count: int, mode: str = "random", client_id: str = "default",
+               model: str = None) -> list:
+        """Return up to `count` random questions of a document and mark them as seen by `client_id`.
+
+        With mode "unseen" only questions the client hasn't been served yet are drawn.
+        """
+        if mode not in SAMPLE_MODES:
+            raise ValueError(f"Unsupported sample mode '{mode}'. Use one of: {', '.join(SAMPLE_MODES)}")
+        where, params = self._filters(doc_hash, model, client_id if mode == "unseen" else None)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, doc_hash, chunk_id, model, mcq FROM questions WHERE {where} ORDER BY RANDOM() LIMIT ?",
+                (*params, count),
+            ).fetchall()
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO seen (client_id, question_id, served_at) VALUES (?, ?, ?)",
+                [(client_id, row[0], now) for row in rows],
+            )
+            self._conn.commit()
+        return [
+            {"id": id_, **json.loads(mcq), "doc_hash": doc, "chunk_id": chunk, "model": mdl}
+            for id_, doc, chunk, mdl, mcq in rows
+        ]
+
+    def count(self, doc_hash: str, client_id: str = None, model: str = None) -> int:
+        """Questions stored for a document; with `client_id`, only those the client hasn't seen."""
+        where, params = self._filters(doc_hash, model, client_id)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM questions WHERE {where}", params).fetchone()[0]
+
+    def documents(self) -> list:
+        """Question counts per document and model."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_hash, model, COUNT(*), MAX(created_at) FROM questions GROUP BY doc_hash, model"
+            ).fetchall()
+        return [{"doc_hash": doc, "model": model, "questions": count, "last_generated_at": last}
+                for doc, model, count, last in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_bank = None
+_bank_lock = threading.Lock()
+
+
+def get_question_bank() -> QuestionBank:
+    """Return the process-wide question bank shared by the API and pipeline runs."""
+    global _bank
+    with _bank_lock:
+        if _bank is None:
+            _bank = QuestionBank()
+        return _bank
@@ -0,0 +1,99 @@
+import os
+import time
+import importlib
+import threading
+from dotenv import load_dotenv
+from services.model_scheduler import get_model_scheduler, warm_models
+
+# Load environment variables from .env file
+load_dotenv()
+
+REQUIRED_SETTINGS = ("OLLAMA_HOST_URL", "OCR_MODEL", "EMBEDDING_MODEL", "MCQ_MODEL")
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() in ("1", "true", "yes")
+# Heavy modules (langchain, Chroma, PyMuPDF) are imported here instead of on startup
+PIPELINE_MODULES = ("services.preprocessing",)
+
+
+class Readiness:
+    """Status of the background warm-up, reported by /api/ready.
+
+    Each check is "pending", "ok", "skipped" or "failed"; the app is ready
+    once none is pending or failed.
+    """
+
+    CHECKS = ("config", "pipeline", "models")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = None
+        self.finished_at = None
+        self.checks = {name: {"status": "pending", "detail": None} for name in self.CHECKS}
+
+    def set(self, name: str, status: str, detail=None):
+        with self._lock:
+            self.checks[name] = {"status": status, "detail": detail}
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return all(check["status"] in ("ok", "skipped") for check in self.checks.values())
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            checks = {name: dict(check) for name, check in self.checks.items()}
+        return {
+            "ready": all(check["status"] in ("ok", "skipped") for check in checks.values()),
+            "checks": checks,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def warm_up(readiness: Readiness, warm_up_models: bool = MODEL_WARMUP):
+    """Validate the settings, import the pipeline and load the models, recording each step."""
+    readiness.started_at = time.time()
+
+    missing = [name for name in REQUIRED_SETTINGS if not os.getenv(name)]
+    readiness.set("config", "failed" if missing else "ok", {"missing": missing} if missing else None)
+
+    try:
+        start = time.perf_counter()
+        for module in PIPELINE_MODULES:
+            importlib.import_module(module)
+        readiness.set("pipeline", "ok", {"import_seconds": round(time.perf_counter() - start, 3)})
+    except Exception as e:
+        readiness.set("pipeline", "failed", f"{type(e).__name__}: {e}")
+
+    if not warm_up_models:
+        readiness.set("models", "skipped", "MODEL_WARMUP is disabled")
+    elif missing:
+        readiness.set("models", "failed", "Missing settings, models were not loaded")
+    else:
+        # Only as many big models as the host keeps resident, in the order the pipeline needs them;
+        # loading the MCQ model too would just evict the OCR model again with one resident slot
+        scheduler = get_model_scheduler()
+        generate_models = list(dict.fromkeys([os.getenv("OCR_MODEL"), os.getenv("MCQ_MODEL")]))
+        generate_models = generate_models[:scheduler.max_resident]
+        embedding_models = [os.getenv("EMBEDDING_MODEL")]
+        warmed = warm_models(os.getenv("OLLAMA_HOST_URL"), generate_models, embedding_models=embedding_models,
+                             scheduler=scheduler)
+        not_loaded = [model for model in dict.fromkeys(generate_models + embedding_models) if model not in warmed]
+        readiness.set("models", "failed" if not_loaded else "ok",
+                      {"not_loaded": not_loaded} if not_loaded else {"loaded": warmed})
+
+    readiness.finished_at = time.time()
+    print("✅ Backend is ready." if readiness.ready else f"⚠️ Backend warm-up incomplete: {readiness.checks}")
+
+
+def start_warm_up() -> threading.Thread:
+    """Run the warm-up in the background so the API can serve requests right away."""
+    thread = threading.Thread(target=warm_up, args=(get_readiness(),), name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+_readiness = Readiness()
+
+
+def get_readiness() -> Readiness:
+    return _readiness
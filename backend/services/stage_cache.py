@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+from collections import Counter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+STAGE_CACHE_DIR = os.getenv("STAGE_CACHE_DIR", "cache/stages")
+STAGE_CACHE_ENABLED = os.getenv("STAGE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+STAGE_CACHE_MAX_ENTRIES = int(os.getenv("STAGE_CACHE_MAX_ENTRIES", "50"))  # per stage, least recently used go first
+MANIFEST_NAME = "manifest.json"
+
+
+def fingerprint(inputs: dict) -> str:
+    """Stable hash of a stage's inputs and parameters."""
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class StageCache:
+    """Make-style memoization of pipeline stages.
+
+    A stage's artifacts are stored in `<root>/<stage>/<fingerprint>/` together
+    with a manifest of the inputs that produced them. When a later run computes
+    the same fingerprint the stage is skipped and its artifacts are copied into
+    the run, so a failed run resumes after the last stage that succeeded.
+    Stages named in `refresh` run again and replace what was stored.
+    """
+
+    def __init__(self, root: str = STAGE_CACHE_DIR, enabled: bool = STAGE_CACHE_ENABLED,
+                 max_entries: int = STAGE_CACHE_MAX_ENTRIES, refresh: tuple = ()):
+        self.root = root
+        self.enabled = enabled
+        self.refresh = refresh
+        self.max_entries = max_entries
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def _entry(self, stage: str, key: str) -> str:
+        return os.path.join(self.root, stage, key)
+
+    def load(self, stage: str, key: str, target_folder: str):
+        """Copy a stored stage's files into `target_folder` and return its metadata, or None."""
+        manifest_path = os.path.join(self._entry(stage, key), MANIFEST_NAME)
+        if not self.enabled or stage in self.refresh or not os.path.exists(manifest_path):
+            self.misses[stage] += 1
+            return None
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        os.makedirs(target_folder, exist_ok=True)
+        for name in manifest["files"]:
+            shutil.copyfile(os.path.join(self._entry(stage, key), name), os.path.join(target_folder, name))
+        os.utime(self._entry(stage, key))  # mark as recently used
+        self.hits[stage] += 1
+        return manifest["meta"]
+
+    def store(self, stage: str, key: str, inputs: dict, source_folder: str, files: list, meta: dict):
+        """Save a finished stage's files and metadata under its fingerprint."""
+        if not self.enabled:
+            return
+        stage_folder = os.path.join(self.root, stage)
+        os.makedirs(stage_folder, exist_ok=True)
+
+        # Build the entry next to its final place and rename it, so readers never see half of it
+        tmp_folder = os.path.join(stage_folder, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_folder)
+        try:
+            for name in files:
+                shutil.copyfile(os.path.join(source_folder, name), os.path.join(tmp_folder, name))
+            manifest = {"stage": stage, "fingerprint": key, "created_at": time.time(),
+                        "inputs": inputs, "files": files, "meta": meta}
+            with open(os.path.join(tmp_folder, MANIFEST_NAME), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, default=str)
+            if stage in self.refresh:
+                shutil.rmtree(self._entry(stage, key), ignore_errors=True)
+            try:
+                os.rename(tmp_folder, self._entry(stage, key))
+            except OSError:
+                pass  # a concurrent run stored the same fingerprint first
+        finally:
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+        self._evict(stage_folder)
+
+    def _evict(self, stage_folder: str):
+        entries = [os.path.join(stage_folder, name) for name in os.listdir(stage_folder) if not name.startswith(".")]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - self.max_entries]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self) -> dict:
+        stages = set(self.hits) | set(self.misses)
+        return {stage: {"hits": self.hits[stage], "misses": self.misses[stage]} for stage in sorted(stages)}
@@ -1,11 +1,27 @@
 import os
 import json
+import math
+import time
+import threading
 from dotenv import load_dotenv
-from langchain.schema import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
 from langchain_ollama import OllamaEmbeddings  # Correct import for the latest version
-from ollama import Client
+from services.mcq_schema import MCQ_JSON_SCHEMA, mcq_batch_schema, parse_mcq, parse_mcq_batch
+from services.mcq_generator import MCQ_MAX_ATTEMPTS_FACTOR, ConcurrentMCQGenerator
+from services.chunk_selection import CHUNK_SELECTION_LAMBDA, group_related_chunks, select_fresh_chunks
+from services.mcq_dedup import MCQ_DEDUP_THRESHOLD, QuestionDeduplicator
+from services.async_utils import run_sync
+from services.model_scheduler import OLLAMA_KEEP_ALIVE, get_model_scheduler
+from services.metrics import track_ollama_call
+from services.page_records import PAGE_RECORDS_FILE, iter_page_records
+from services.chunker import CHUNK_OVERLAP, CHUNK_SIZE, MIN_CHUNK_CHARS, PageChunker
+from services.vector_store import (
+    COLLECTION_NAME,
+    PERSIST_DIRECTORY,
+    garbage_collect,
+    get_chunks,
+    upsert_chunk_stream,
+)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,120 +30,247 @@ load_dotenv()
 ollama_host_url = os.getenv("OLLAMA_HOST_URL")
 embedding_model = os.getenv("EMBEDDING_MODEL")
 mcq_model = os.getenv("MCQ_MODEL")
+mcq_batch_size = int(os.getenv("MCQ_BATCH_SIZE", "1"))  # questions requested per chat call
+mcq_batch_chunks = int(os.getenv("MCQ_BATCH_CHUNKS", "1"))  # related chunks combined into one batched prompt
 
 # Debugging: Print the loaded environment variables to check
 # print(f"OLLAMA_HOST_URL: {ollama_host_url}")
 # print(f"EMBEDDING_MODEL: {embedding_model}")
 # print(f"MCQ_MODEL: {mcq_model}")
 
-# Validate the variables to make sure they are not None or empty
-if not ollama_host_url or not embedding_model:
-    raise ValueError("OLLAMA_HOST_URL and EMBEDDING_MODEL must be set in the environment variables.")
+_embeddings = None
 
-# --- Setup ---
-client = Client(host=ollama_host_url)
-embeddings = OllamaEmbeddings(model=embedding_model, base_url=ollama_host_url)
 
+def get_embeddings() -> OllamaEmbeddings:
+    """Build the embedding client on first use, so a missing setting only fails the pipeline."""
+    global _embeddings
+    if _embeddings is None:
+        # Validate the variables to make sure they are not None or empty
+        if not ollama_host_url or not embedding_model:
+            raise ValueError("OLLAMA_HOST_URL and EMBEDDING_MODEL must be set in the environment variables.")
+        _embeddings = OllamaEmbeddings(model=embedding_model, base_url=ollama_host_url,
+                                       keep_alive=OLLAMA_KEEP_ALIVE)
+    return _embeddings
 
-class TextToMCQ:
-    """Convert cleaned text into MCQs using Chroma DB and Ollama API."""
-
-    def __init__(self, text: str, output_folder: str = "output"):
-        self.text = text
-        self.output_folder = output_folder
 
-    def load_and_clean_text(self):
-        """Clean the input text and prepare for processing."""
-        lines = [line for line in self.text.splitlines() if not line.strip().startswith('--- Page')]
-        cleaned_text = "\n".join(lines)
-        return cleaned_text
-
-    def embed_text_to_db(self, text, persist_dir="./qwen_embed", collection_name="local_rag_db"):
-        """Embed cleaned text into Chroma DB."""
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
-        chunks = splitter.split_text(text)
-        docs = [Document(page_content=chunk) for chunk in chunks if chunk.strip()]
-
-        vector_db = Chroma(
-            persist_directory=persist_dir,
-            embedding_function=embeddings,
-            collection_name=collection_name
-        )
+_vector_dbs = {}
+_vector_db_lock = threading.Lock()
 
-        vector_db.add_documents(docs)
-        print(f"✅ Embedded {len(docs)} meaningful chunks into Chroma DB")
-        return vector_db
 
-    def generate_raw_mcqs(self, vector_db, num_questions, output_file="generated_question.txt"):
-        """Generate raw MCQs based on the content in Chroma DB."""
-        docs = vector_db._collection.get(include=["documents"])["documents"]
-        if not docs:
-            print("⚠️ No documents found in DB.")
-            return
+def get_vector_db(persist_dir: str = PERSIST_DIRECTORY, collection_name: str = COLLECTION_NAME) -> Chroma:
+    """Return the process-wide Chroma store; opening one per run races when runs overlap."""
+    with _vector_db_lock:
+        key = (os.path.abspath(persist_dir), collection_name)
+        if key not in _vector_dbs:
+            _vector_dbs[key] = Chroma(
+                persist_directory=persist_dir,
+                embedding_function=get_embeddings(),
+                collection_name=collection_name
+            )
+        return _vector_dbs[key]
 
-        raw_prompt_template = """
+MCQ_PROMPT_TEMPLATE = """
         Based on the following content, generate ONE multiple-choice question.
         Important Instructions:
-            - Follow the format STRICTLY as shown below.
+            - Respond with a JSON object with the fields "question", "options" (with keys "A", "B", "C" and "D"), "correct_answer" and "description".
+            - "correct_answer" is just the letter of the correct option (A or B or C or D).
             - Do NOT use raw examples mentioned in the text directly as answer options, unless they are essential for understanding.
             - The question must be clear, contextual, and stand alone (it should make sense even without reading the original text).
             - Keep the description concise and explanatory.
 
-        Question No: <number>
-        Question: <the question>
-        Options:
-        A. <option A>
-        B. <option B>
-        C. <option C>
-        D. <option D>
-        Correct Answer: Just Correct Option (A or B or C or D)
-        Description: <short explanation>
+        Content: {content}
+        """
+
+MCQ_BATCH_PROMPT_TEMPLATE = """
+        Based on the following content, generate {count} different multiple-choice questions.
+        Important Instructions:
+            - Respond with a JSON object with a "questions" list of exactly {count} items.
+            - Each item has the fields "question", "options" (with keys "A", "B", "C" and "D"), "correct_answer" and "description".
+            - "correct_answer" is just the letter of the correct option (A or B or C or D).
+            - Each question must cover a different fact or idea from the content.
+            - Do NOT use raw examples mentioned in the text directly as answer options, unless they are essential for understanding.
+            - Every question must be clear, contextual, and stand alone (it should make sense even without reading the original text).
+            - Keep the descriptions concise and explanatory.
 
         Content: {content}
         """
 
-        doc_index = 0
-        total_docs = len(docs)
-        raw_mcqs = []
 
-        while len(raw_mcqs) < num_questions:
-            content = docs[doc_index % total_docs]  # cycle through docs
-            prompt = raw_prompt_template.format(content=content)
+def generation_settings(batch_size: int = 1):
+    """Return (build_prompt, response_format, validate) for single or batched generation."""
+    if batch_size > 1:
+        return (
+            lambda content: MCQ_BATCH_PROMPT_TEMPLATE.format(count=batch_size, content=content),
+            mcq_batch_schema(batch_size),
+            parse_mcq_batch,
+        )
+    return lambda content: MCQ_PROMPT_TEMPLATE.format(content=content), MCQ_JSON_SCHEMA, parse_mcq
+
+
+def generation_parameters(num_questions: int) -> dict:
+    """Everything besides the extracted text that changes the generated questions.
+
+    The prompts and schema are included verbatim, so editing them invalidates
+    memoized results without a separate version number.
+    """
+    return {
+        "num_questions": num_questions,
+        "mcq_model": mcq_model,
+        "embedding_model": embedding_model,
+        "batch_size": mcq_batch_size,
+        "batch_chunks": mcq_batch_chunks,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "min_chunk_chars": MIN_CHUNK_CHARS,
+        "selection_lambda": CHUNK_SELECTION_LAMBDA,
+        "dedup_threshold": MCQ_DEDUP_THRESHOLD,
+        "prompts": [MCQ_PROMPT_TEMPLATE, MCQ_BATCH_PROMPT_TEMPLATE],
+        "schema": MCQ_JSON_SCHEMA,
+    }
+
+
+class NoExtractableText(Exception):
+    """Raised when the PDFs of a run yielded no text to generate questions from."""
+
+
+class TextToMCQ:
+    """Convert extracted pages into MCQs using Chroma DB and Ollama API."""
+
+    def __init__(self, pages, output_folder: str = "output", documents: list = None, question_bank=None,
+                 extend_bank: bool = False):
+        # Page records ({"file", "sha256", "page", "text", ...}) in document and page order, read once
+        self.pages = pages
+        # Accepted questions are also added here, keyed by the document and chunk they came from
+        self.question_bank = question_bank
+        # Only add questions the bank doesn't have yet, preferably from chunks it has no questions of
+        self.extend_bank = extend_bank
+        self.timings = {}
+        self.output_folder = output_folder
+        # [{"file", "sha256", "uploaded_at"}] as reported by the extraction stage
+        self.documents = {doc["file"]: doc for doc in documents or []}
+        self.doc_hashes = []
+        self.chunk_ids = []  # chunks of this run, in document and page order
+        self.mcqs = []
+        self.generation_stats = {}
+        self.embedding_stats = {}
+
+    def iter_chunks(self):
+        """Yield the chunks of the page records as they are read (see `PageChunker`), noting their ids."""
+        self.doc_hashes, self.chunk_ids = [], []
+        for chunk in PageChunker().iter_chunks(self.pages):
+            metadata = chunk["metadata"]
+            if metadata["doc_hash"] not in self.doc_hashes:
+                self.doc_hashes.append(metadata["doc_hash"])
+            metadata["uploaded_at"] = self.documents.get(metadata["source"], {}).get("uploaded_at", time.time())
+            self.chunk_ids.append(chunk["id"])
+            yield chunk
+
+    def embed_pages_to_db(self, persist_dir=PERSIST_DIRECTORY, collection_name=COLLECTION_NAME):
+        """Embed the page records into Chroma DB as they are chunked, tagging each chunk with its source document."""
+        vector_db = get_vector_db(persist_dir, collection_name)
+
+        self.embedding_stats = upsert_chunk_stream(vector_db, get_embeddings(), self.iter_chunks(), embedding_model)
+        print(f"✅ Embedded {self.embedding_stats['new']} new chunks into Chroma DB "
+              f"({self.embedding_stats['reused']} already stored)")
+        self.embedding_stats["garbage_collected"] = garbage_collect(vector_db._collection)
+        return vector_db
+
+    def generate_raw_mcqs(self, vector_db, num_questions, output_file="generated_question.json", on_mcq=None,
+                          batch_size=None, batch_chunks=None, checkpoint=None):
+        """Generate MCQs based on the content in Chroma DB and save them as JSON.
+
+        Responses are constrained to the MCQ JSON schema and validated one by
+        one; only items that fail validation are regenerated. With
+        `batch_size` > 1 every call asks for that many questions from a group
+        of `batch_chunks` related chunks, so the instructions are prefilled
+        once per batch instead of once per question. `on_mcq(mcq)` is
+        called with each question as soon as it is accepted, so callers can
+        stream questions out early. `checkpoint()` is called around every
+        generation request so a cancelled job stops between them.
+
+        With `extend_bank`, questions already in the question bank for these
+        documents count as accepted for de-duplication, and chunks they were
+        generated from are only used once every other chunk has been.
+        """
+        # Only the chunks of this run, not everything ever stored for these documents
+        stored = get_chunks(vector_db._collection, self.chunk_ids, include=["documents", "embeddings", "metadatas"])
+        if not stored["documents"]:
+            print("⚠️ No documents found in DB.")
+            raise NoExtractableText("No extractable text was found in the uploaded PDFs.")
+
+        # Spread the questions over the whole document instead of its first chunks;
+        # enough chunks are ranked to cover every attempt the generator may make
+        batch_size = max(1, batch_size or mcq_batch_size)
+        batch_chunks = max(1, batch_chunks or mcq_batch_chunks)
+        max_attempts = math.ceil(num_questions * MCQ_MAX_ATTEMPTS_FACTOR / batch_size)
+        deduplicator = QuestionDeduplicator()
+        banked = []
+        if self.extend_bank and self.question_bank is not None:
+            banked = [entry for doc_hash in self.doc_hashes for entry in self.question_bank.questions(doc_hash)]
+        if banked and deduplicator.enabled:
+            with get_model_scheduler().use(embedding_model), track_ollama_call(embedding_model, "embed"):
+                deduplicator.seed(get_embeddings().embed_documents([question for _, question in banked]))
+        banked_chunks = {chunk_id for chunk_id, _ in banked}
+        used = {index for index, chunk_id in enumerate(stored["ids"]) if chunk_id in banked_chunks}
+        order = select_fresh_chunks(stored["embeddings"], max_attempts, used)
+        groups = group_related_chunks(stored["embeddings"], order, batch_chunks)
+        docs = ["\n\n".join(stored["documents"][idx] for idx in group) for group in groups]
+        print(f"🎯 Selected {len(docs)} diverse chunks out of {len(stored['documents'])}"
+              + (f", avoiding {len(used)} with {len(banked)} banked questions" if banked else ""))
 
-            response = client.chat(model=mcq_model, messages=[{"role": "user", "content": prompt}])
-            mcq_text = response.get("message", {}).get("content", "").strip()
+        build_prompt, response_format, validate = generation_settings(batch_size)
 
-            if mcq_text:
-                raw_mcqs.append(mcq_text)
-                print(f"✅ Generated raw Q{len(raw_mcqs)}")
-            else:
-                print(f"⚠️ Empty response for doc {doc_index}")
+        def accept(mcq, source_index):
+            seed = groups[source_index][0]  # the chunk the group was built around
+            metadata = stored["metadatas"][seed]
+            # Cite where the question comes from
+            source = {"file": metadata["source"], "page_start": metadata.get("page_start"),
+                      "page_end": metadata.get("page_end"), "chunk_id": stored["ids"][seed]}
+            mcq = {"question_no": len(self.mcqs) + 1, **mcq, "source": source}
+            self.mcqs.append(mcq)
+            if self.question_bank is not None:
+                self.question_bank.add(metadata["doc_hash"], stored["ids"][seed], mcq_model, mcq)
+            if on_mcq is not None:
+                on_mcq(mcq)
 
-            doc_index += 1
+        self.mcqs = []
+        generator = ConcurrentMCQGenerator(model=mcq_model, host=ollama_host_url, items_per_request=batch_size,
+                                           response_format=response_format,
+                                           deduplicator=deduplicator, embedding_model=embedding_model)
+        run_sync(generator.generate(
+            docs,
+            num_questions,
+            build_prompt=build_prompt,
+            validate=validate,
+            on_accept=accept,
+            dedup_text=lambda mcq: mcq["question"],
+            checkpoint=checkpoint,
+        ))
+        self.generation_stats = generator.stats
 
         # Save generated MCQs in JSON format
+        output_path = os.path.join(self.output_folder, output_file)
         os.makedirs(self.output_folder, exist_ok=True)
-        with open(os.path.join(self.output_folder, output_file), "w", encoding="utf-8") as f:
-            json.dump(raw_mcqs, f, indent=4)
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(self.mcqs, f, indent=4)
 
-        print(f"💾 Saved raw MCQs to {os.path.join(self.output_folder, output_file)}")
+        print(f"💾 Saved {len(self.mcqs)} MCQs to {output_path}")
 
-    def process(self, num_questions=10):
-        """Full process to clean text, embed it into the database, and generate MCQs."""
-        cleaned_text = self.load_and_clean_text()
-        db = self.embed_text_to_db(cleaned_text)
-        self.generate_raw_mcqs(db, num_questions)
+    def process(self, num_questions=10, on_mcq=None, checkpoint=None):
+        """Full process to chunk the pages, embed them into the database, and generate MCQs."""
+        start = time.perf_counter()
+        db = self.embed_pages_to_db()
+        embedded = time.perf_counter()
+        self.generate_raw_mcqs(db, num_questions, on_mcq=on_mcq, checkpoint=checkpoint)
+        # Wall time per step, reported with the pipeline result
+        self.timings = {"embed": embedded - start, "generate": time.perf_counter() - embedded}
 
 
 # --- Running the pipeline ---
 if __name__ == "__main__":
-    # Assuming text extraction from PDF has been done and you now have `cleaned_text`
-    # cleaned_text = "Extracted text from PDF"
-    txt_file_path = "output/combined_output.txt"  # Path to the text file that you got from pdf_to_text.py
-    
-    with open(txt_file_path, "r", encoding="utf-8") as f:
-        extracted_text = f.read()
+    # Assuming text extraction from PDF has been done by pdf_to_text.py
+    pages_file_path = f"output/{PAGE_RECORDS_FILE}"
 
     # Create an instance of the TextToMCQ class and run the process
-    text_to_mcq_processor = TextToMCQ(extracted_text, output_folder="output")
+    text_to_mcq_processor = TextToMCQ(iter_page_records(pages_file_path), output_folder="output")
     text_to_mcq_processor.process(num_questions=10)
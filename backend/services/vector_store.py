@@ -0,0 +1,167 @@
+import os
+import time
+import hashlib
+from itertools import islice
+from dotenv import load_dotenv
+from services.model_scheduler import get_model_scheduler
+from services.metrics import track_ollama_call
+
+load_dotenv()
+
+PERSIST_DIRECTORY = os.getenv("PERSIST_DIRECTORY", "./qwen_embed")
+COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "local_rag_db")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))  # chunks per embedding request
+VECTOR_TTL_SECONDS = float(os.getenv("VECTOR_TTL_SECONDS", str(7 * 24 * 3600)))  # 0 disables garbage collection
+ID_LOOKUP_BATCH_SIZE = 500  # ids per Chroma `get` when checking what is already stored
+UPSERT_WINDOW = int(os.getenv("UPSERT_WINDOW", "512"))  # chunks taken from a stream per upsert
+
+
+def content_hash(text: str, embedding_model: str) -> str:
+    """Hash of what determines an embedding: the chunk text and the model that embeds it."""
+    return hashlib.sha256(f"{embedding_model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def chunk_id(doc_hash: str, text: str, embedding_model: str) -> str:
+    """Deterministic vector id, namespaced by the document the chunk came from, for chunks without an id."""
+    return hashlib.sha256(f"{doc_hash}\x00{content_hash(text, embedding_model)}".encode("utf-8")).hexdigest()
+
+
+def get_collection():
+    """Open the persistent Chroma collection without going through LangChain."""
+    import chromadb  # imported lazily so callers like the file manager stay light
+
+    client = chromadb.PersistentClient(path=PERSIST_DIRECTORY)
+    return client.get_or_create_collection(COLLECTION_NAME)
+
+
+def _batches(items: list, size: int = ID_LOOKUP_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def stored_content_hashes(collection, ids: list) -> dict:
+    """Return {id: content_hash} for the `ids` already present in the collection."""
+    found = {}
+    for batch in _batches(ids):
+        stored = collection.get(ids=batch, include=["metadatas"])
+        for id_, metadata in zip(stored["ids"], stored["metadatas"]):
+            found[id_] = (metadata or {}).get("content_hash")
+    return found
+
+
+def embeddings_by_content(collection, content_hashes: list) -> dict:
+    """Return {content_hash: embedding} for chunks already embedded under any document."""
+    found = {}
+    for batch in _batches(content_hashes):
+        stored = collection.get(where={"content_hash": {"$in": batch}}, include=["metadatas", "embeddings"])
+        for metadata, embedding in zip(stored["metadatas"], stored["embeddings"]):
+            found.setdefault(metadata["content_hash"], embedding)
+    return found
+
+
+def upsert_chunks(vector_db, embeddings, chunks: list, embedding_model: str,
+                  batch_size: int = EMBED_BATCH_SIZE) -> dict:
+    """Store chunks under their document namespace, embedding only unseen content.
+
+    `chunks` are {"id": ..., "text": ..., "metadata": {...}} dicts whose metadata
+    carries at least `doc_hash`; without an id one is derived from the text.
+    Chunks already stored under their id with the same content only get their
+    `last_used` timestamp refreshed, and chunks whose text was already embedded
+    elsewhere (another document, or another position) reuse that vector. A
+    stored id whose content changed is embedded again. Returns new vs. reused
+    counts.
+    """
+    collection = vector_db._collection
+    now = time.time()
+    entries = {}
+    for chunk in chunks:
+        text = chunk["text"]
+        digest = content_hash(text, embedding_model)
+        metadata = {**chunk["metadata"], "content_hash": digest, "embedding_model": embedding_model, "last_used": now}
+        entries.setdefault(chunk.get("id") or chunk_id(metadata["doc_hash"], text, embedding_model),
+                           (text, metadata))
+
+    ids = list(entries)
+    stored_hashes = stored_content_hashes(collection, ids)
+    stored = {id_ for id_ in ids if stored_hashes.get(id_) == entries[id_][1]["content_hash"]}
+    for batch in _batches([id_ for id_ in ids if id_ in stored]):
+        collection.update(ids=batch, metadatas=[entries[id_][1] for id_ in batch])
+
+    missing = [id_ for id_ in ids if id_ not in stored]
+    known_vectors = embeddings_by_content(collection, list({entries[id_][1]["content_hash"] for id_ in missing}))
+    copied = [id_ for id_ in missing if entries[id_][1]["content_hash"] in known_vectors]
+    for batch in _batches(copied):
+        collection.upsert(
+            ids=batch,
+            embeddings=[known_vectors[entries[id_][1]["content_hash"]] for id_ in batch],
+            documents=[entries[id_][0] for id_ in batch],
+            metadatas=[entries[id_][1] for id_ in batch],
+        )
+
+    new_ids = [id_ for id_ in missing if entries[id_][1]["content_hash"] not in known_vectors]
+    for batch in _batches(new_ids, batch_size):
+        texts = [entries[id_][0] for id_ in batch]
+        with get_model_scheduler().use(embedding_model), track_ollama_call(embedding_model, "embed"):
+            vectors = embeddings.embed_documents(texts)
+        collection.upsert(
+            ids=batch,
+            embeddings=vectors,
+            documents=texts,
+            metadatas=[entries[id_][1] for id_ in batch],
+        )
+
+    return {"new": len(new_ids), "reused": len(stored) + len(copied)}
+
+
+def upsert_chunk_stream(vector_db, embeddings, chunks, embedding_model: str, window: int = UPSERT_WINDOW) -> dict:
+    """`upsert_chunks` over any iterable of chunks, `window` chunks at a time.
+
+    Chunks are pulled from the iterable as they are stored, so a lazily
+    produced corpus is never held in memory as a whole.
+    """
+    chunks = iter(chunks)
+    totals = {"new": 0, "reused": 0}
+    while True:
+        window_chunks = list(islice(chunks, window))
+        if not window_chunks:
+            return totals
+        stats = upsert_chunks(vector_db, embeddings, window_chunks, embedding_model)
+        totals["new"] += stats["new"]
+        totals["reused"] += stats["reused"]
+
+
+def get_chunks(collection, ids: list, include: list = None) -> dict:
+    """Fetch the given chunks in the order of `ids`, skipping ids that aren't stored."""
+    include = include or ["documents"]
+    rows = {}
+    for batch in _batches(list(dict.fromkeys(ids))):
+        stored = collection.get(ids=batch, include=include)
+        for index, id_ in enumerate(stored["ids"]):
+            rows[id_] = [stored[key][index] for key in include]
+    found_ids = [id_ for id_ in dict.fromkeys(ids) if id_ in rows]
+    return {"ids": found_ids, **{key: [rows[id_][pos] for id_ in found_ids] for pos, key in enumerate(include)}}
+
+
+def delete_document_vectors(doc_hashes: list, collection=None) -> int:
+    """Remove every vector stored for the given documents and return how many were deleted."""
+    if not doc_hashes:
+        return 0
+    collection = collection or get_collection()
+    ids = collection.get(where={"doc_hash": {"$in": list(doc_hashes)}}, include=[])["ids"]
+    for batch in _batches(ids):
+        collection.delete(ids=batch)
+    return len(ids)
+
+
+def garbage_collect(collection=None, ttl_seconds: float = VECTOR_TTL_SECONDS) -> int:
+    """Delete vectors that have not been used for `ttl_seconds`; returns the number removed."""
+    if ttl_seconds <= 0:
+        return 0
+    collection = collection or get_collection()
+    cutoff = time.time() - ttl_seconds
+    ids = collection.get(where={"last_used": {"$lt": cutoff}}, include=[])["ids"]
+    for batch in _batches(ids):
+        collection.delete(ids=batch)
+    if ids:
+        print(f"🗑️ Garbage-collected {len(ids)} vectors unused for {ttl_seconds:.0f}s")
+    return len(ids)
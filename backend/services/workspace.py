@@ -0,0 +1,125 @@
+import os
+import time
+import uuid
+import shutil
+from dotenv import load_dotenv
+from services.hashing import file_sha256, record_sha256
+
+# Load environment variables from .env file
+load_dotenv()
+
+WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT", "runs")
+WORKSPACE_QUOTA_BYTES = int(os.getenv("WORKSPACE_QUOTA_BYTES", str(1024 * 1024 * 1024)))  # per run
+WORKSPACE_RETENTION_SECONDS = float(os.getenv("WORKSPACE_RETENTION_SECONDS", "86400"))  # results of past runs
+WORKSPACE_KEEP_INTERMEDIATES = os.getenv("WORKSPACE_KEEP_INTERMEDIATES", "false").lower() in ("1", "true", "yes")
+
+
+class WorkspaceQuotaExceeded(Exception):
+    """Raised when a run writes more than its disk quota."""
+
+
+class RunWorkspace:
+    """Private folders of one pipeline run, so concurrent runs never share files.
+
+    Layout under `<root>/<run_id>/`:
+        input/    snapshot of the PDFs the run was started with
+        work/     intermediates such as the extracted page records
+        results/  the generated questions
+
+    Used as a context manager: input and work are removed when the run
+    ends, results are kept until `prune_workspaces` expires them.
+    """
+
+    SUBFOLDERS = ("input", "work", "results")
+
+    def __init__(self, root: str = WORKSPACE_ROOT, quota_bytes: int = WORKSPACE_QUOTA_BYTES,
+                 run_id: str = None, keep_intermediates: bool = WORKSPACE_KEEP_INTERMEDIATES):
+        self.run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.path = os.path.join(root, self.run_id)
+        self.quota_bytes = quota_bytes
+        self.keep_intermediates = keep_intermediates
+        for name in self.SUBFOLDERS:
+            os.makedirs(os.path.join(self.path, name), exist_ok=True)
+
+    @property
+    def input_folder(self) -> str:
+        return os.path.join(self.path, "input")
+
+    @property
+    def work_folder(self) -> str:
+        return os.path.join(self.path, "work")
+
+    @property
+    def results_folder(self) -> str:
+        return os.path.join(self.path, "results")
+
+    def snapshot_inputs(self, upload_folder: str) -> list:
+        """Hard-link (or copy) the current PDFs into input/ and return their names.
+
+        Uploads or deletions that happen while the run is going don't affect it.
+        """
+        if not os.path.isdir(upload_folder):
+            return []
+        names = sorted(f for f in os.listdir(upload_folder) if f.endswith(".pdf"))
+        return self.snapshot_files([os.path.join(upload_folder, name) for name in names])
+
+    def snapshot_files(self, paths: list) -> list:
+        """Hard-link (or copy) the given PDFs into input/ and return their names."""
+        names = []
+        for source in paths:
+            name = os.path.basename(source)
+            target = os.path.join(self.input_folder, name)
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)  # e.g. across filesystems
+            record_sha256(target, file_sha256(source))
+            names.append(name)
+        return names
+
+    def usage(self) -> int:
+        """Bytes this run added to the disk; hard-linked inputs are shared and not counted."""
+        total = 0
+        for folder, _, files in os.walk(self.path):
+            for name in files:
+                stat = os.stat(os.path.join(folder, name))
+                if folder == self.input_folder and stat.st_nlink > 1:
+                    continue
+                total += stat.st_size
+        return total
+
+    def check_quota(self):
+        used = self.usage()
+        if self.quota_bytes and used > self.quota_bytes:
+            raise WorkspaceQuotaExceeded(
+                f"Run {self.run_id} uses {used} bytes, more than its {self.quota_bytes} byte quota."
+            )
+
+    def cleanup(self):
+        """Remove everything but the results."""
+        if self.keep_intermediates:
+            return
+        for name in ("input", "work"):
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+
+def prune_workspaces(root: str = WORKSPACE_ROOT, retention_seconds: float = WORKSPACE_RETENTION_SECONDS) -> int:
+    """Delete run folders that haven't changed for `retention_seconds`; returns how many."""
+    if not os.path.isdir(root):
+        return 0
+    cutoff = time.time() - retention_seconds
+    removed = 0
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    if removed:
+        print(f"🧹 Removed {removed} expired run workspaces from {root}")
+    return removed
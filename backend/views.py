@@ -1,22 +1,47 @@
+import json
+import asyncio
+import threading
 import traceback
-from fastapi import APIRouter, File, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
-from services.preprocessing import generate_mcqs_pipeline
-from file_manager import delete_all_pdfs, save_uploaded_files
+from typing import Literal, Optional
+from fastapi import APIRouter, File, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from services.jobs import get_job_manager
+from services.model_scheduler import get_model_scheduler
+from services.readiness import get_readiness
+from services.question_bank import QUESTION_BANK_LOW_WATERMARK, QUESTION_BANK_REFILL_SIZE, get_question_bank
+from file_manager import blob_path, delete_all_pdfs, save_uploaded_files
 
 api = APIRouter(prefix="/api")
 
+
+def generate_mcqs_pipeline(**kwargs):
+    # Imported on first use: the pipeline pulls in langchain, Chroma and PyMuPDF
+    from services.preprocessing import generate_mcqs_pipeline as run_pipeline
+    return run_pipeline(**kwargs)
+
+
 @api.get("/hello", tags=["Greeting"])
 def hello():
     return {"message": "Hello, Anon!"}
 
+# Endpoint to check whether the warm-up finished and the pipeline can take requests
+@api.get("/ready", tags=["Greeting"])
+def ready():
+    readiness = get_readiness()
+    return JSONResponse(content=readiness.to_dict(), status_code=200 if readiness.ready else 503)
+
 # Endpoint to upload files
 @api.post("/upload-files/", tags=["File Manager"])
 async def upload_files(files: list[UploadFile] = File(...)):
     try:
-        uploaded_file_names = await save_uploaded_files(files)
+        uploaded_files = await save_uploaded_files(files)
         return JSONResponse(
-            content={"message": "Files successfully uploaded", "files": uploaded_file_names},
+            content={
+                "message": "Files successfully uploaded",
+                "files": [upload["file"] for upload in uploaded_files],
+                "uploads": uploaded_files,  # with the sha256 later stages key their caches on
+            },
             status_code=200  # OK status code
         )
     except HTTPException as e:
@@ -48,12 +73,179 @@ async def delete_pdfs():
 
 # API endpoint to generate MCQs from PDFs
 @api.post("/generate-mcqs", tags=["File Manager"])
-async def generate_mcqs():
+async def generate_mcqs(extraction_mode: Optional[Literal["auto", "ocr", "native"]] = None, refresh: bool = False):
     try:
-        result = generate_mcqs_pipeline()
+        # Run in the threadpool so a long OCR+LLM run doesn't block the event loop
+        result = await run_in_threadpool(generate_mcqs_pipeline, extraction_mode=extraction_mode, refresh=refresh)
         return JSONResponse(content=result, status_code=200)
     except Exception as e:
         #return JSONResponse(content={"message": str(e)}, status_code=500)
         tb = traceback.format_exc()
         print(f"Error in generate_mcqs: {tb}")
-        return JSONResponse(content={"message": str(e), "traceback": tb}, status_code=500)
\ No newline at end of file
+        return JSONResponse(content={"message": str(e), "traceback": tb}, status_code=500)
+
+
+# Endpoint to inspect which models are resident and how often they were (un)loaded
+@api.get("/models/residency", tags=["Models"])
+def model_residency():
+    return get_model_scheduler().stats()
+
+
+# Endpoint to start MCQ generation as a background job
+@api.post("/jobs/generate-mcqs", tags=["Jobs"])
+async def submit_generate_mcqs_job(num_questions: int = 10,
+                                   extraction_mode: Optional[Literal["auto", "ocr", "native"]] = None,
+                                   refresh: bool = False):
+    if num_questions < 1:
+        raise HTTPException(status_code=400, detail="num_questions must be at least 1.")
+    job = get_job_manager().submit(generate_mcqs_pipeline, num_questions=num_questions,
+                                   extraction_mode=extraction_mode, refresh=refresh)
+    return JSONResponse(content=job.to_dict(), status_code=202)  # Accepted, runs in the background
+
+
+# Endpoint to check the stage and progress of a job
+@api.get("/jobs/{job_id}", tags=["Jobs"])
+async def get_job(job_id: str):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return JSONResponse(content=job.to_dict(), status_code=200)
+
+
+# Endpoint to fetch the generated MCQs of a finished job
+@api.get("/jobs/{job_id}/result", tags=["Jobs"])
+async def get_job_result(job_id: str):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status == "cancelled":
+        raise HTTPException(status_code=410, detail="Job was cancelled.")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is still {job.status}.")
+    return JSONResponse(content=job.result, status_code=200)
+
+
+# Endpoint to cancel a queued or running job
+@api.delete("/jobs/{job_id}", tags=["Jobs"])
+async def cancel_job(job_id: str):
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return JSONResponse(content=job.to_dict(), status_code=200)
+
+
+_refill_jobs = {}  # doc_hash -> id of the job generating more questions for it
+_refill_lock = threading.Lock()
+
+
+def refill_question_bank(doc_hash: str) -> Optional[dict]:
+    """Start generating questions for one document unless that is already running.
+
+    Returns the refill job, or None when the document's PDF isn't in the upload store.
+    """
+    pdf_path = blob_path(doc_hash)
+    if not pdf_path.exists():
+        return None
+    with _refill_lock:
+        job = get_job_manager().get(_refill_jobs[doc_hash]) if doc_hash in _refill_jobs else None
+        if job is None or job.finished:
+            # Only the generation stage is rerun, skipping what the bank already covers
+            job = get_job_manager().submit(generate_mcqs_pipeline, num_questions=QUESTION_BANK_REFILL_SIZE,
+                                           pdf_paths=[str(pdf_path)], refresh=["generate"], extend_bank=True)
+            _refill_jobs[doc_hash] = job.id
+        return job.to_dict()
+
+
+# Endpoint to list the documents that have questions in the bank
+@api.get("/question-bank", tags=["Question Bank"])
+def list_question_bank():
+    return JSONResponse(content={"documents": get_question_bank().documents()}, status_code=200)
+
+
+# Endpoint to draw stored questions for a document without calling the LLM
+@api.get("/question-bank/{doc_hash}/questions", tags=["Question Bank"])
+def sample_questions(doc_hash: str, count: int = 10, mode: Literal["random", "unseen"] = "random",
+                     client_id: str = "default", model: Optional[str] = None):
+    if count < 1:
+        raise HTTPException(status_code=400, detail="count must be at least 1.")
+    bank = get_question_bank()
+    questions = bank.sample(doc_hash, count, mode=mode, client_id=client_id, model=model)
+    remaining = bank.count(doc_hash, client_id=client_id if mode == "unseen" else None, model=model)
+
+    # Only pay for generation when the bank for this document runs low
+    refill_job = refill_question_bank(doc_hash) if remaining < QUESTION_BANK_LOW_WATERMARK else None
+    if not questions and refill_job is None:
+        raise HTTPException(status_code=404, detail="No questions stored for this document and its PDF was not uploaded.")
+    return JSONResponse(
+        content={"doc_hash": doc_hash, "questions": questions, "remaining": remaining, "refill_job": refill_job},
+        status_code=200,
+    )
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Serialize one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# Endpoint to stream progress and questions as server-sent events while they are generated
+@api.post("/generate-mcqs/stream", tags=["File Manager"])
+async def stream_generate_mcqs(request: Request, num_questions: int = 10,
+                               extraction_mode: Optional[Literal["auto", "ocr", "native"]] = None,
+                               refresh: bool = False):
+    if num_questions < 1:
+        raise HTTPException(status_code=400, detail="num_questions must be at least 1.")
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def emit(event, data):
+        # Called from the job's worker thread
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    def run(progress):
+        def report(stage, fraction=None):
+            progress(stage, fraction)
+            emit("progress", {"stage": stage, "progress": fraction})
+
+        try:
+            result = generate_mcqs_pipeline(extraction_mode=extraction_mode, num_questions=num_questions,
+                                            progress=report, on_mcq=lambda mcq: emit("mcq", mcq),
+                                            refresh=refresh)
+        except Exception as e:
+            emit("error", {"message": getattr(e, "detail", None) or str(e)})
+            raise
+        emit("done", {key: value for key, value in result.items() if key != "mcqs"})
+        return result
+
+    job = get_job_manager().submit(run)
+
+    async def event_stream():
+        ended = False
+        try:
+            yield format_sse("job", job.to_dict())
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(events.get(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    if job.finished and events.empty():
+                        # e.g. cancelled before it started, so no final event was emitted
+                        yield format_sse("error", {"message": f"Job {job.status}"})
+                        ended = True
+                        return
+                    continue
+                yield format_sse(event, data)
+                if event in ("done", "error"):
+                    ended = True
+                    return
+        finally:
+            # Starlette closes the generator when the client disconnects, so nobody is
+            # left to read the questions; stop the job instead of letting it run on
+            if not ended and not job.finished:
+                get_job_manager().cancel(job.id)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
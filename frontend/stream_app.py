@@ -1,11 +1,12 @@
 import streamlit as st
 import requests
+import json
 import time
 
 # FastAPI endpoint URL for file upload and MCQ generation
 FASTAPI_UPLOAD_URL = "http://localhost:8080/api/upload-files/"
 FASTAPI_DELETE_URL = "http://localhost:8080/api/delete-pdfs/"
-FASTAPI_GENERATE_MCQS_URL = "http://localhost:8080/api/generate-mcqs/"
+FASTAPI_STREAM_MCQS_URL = "http://localhost:8080/api/generate-mcqs/stream"
 
 # Function to upload files to FastAPI
 def upload_pdf_to_fastapi(pdf_files):
@@ -34,20 +35,51 @@ def delete_pdfs():
     except Exception as e:
         st.error(f"An error occurred while deleting PDFs: {e}")
 
-# Function to generate MCQs
-def generate_mcqs():
+# Parse a server-sent event stream into (event, data) pairs
+def iter_sse_events(response):
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
+# Function to generate MCQs, showing each question as soon as the backend streams it
+def stream_mcqs():
+    questions = []
+    progress_bar = st.progress(0.0, text="Starting...")
+    preview = st.container()
     try:
-        # Send POST request to generate MCQs
-        response = requests.post(FASTAPI_GENERATE_MCQS_URL)
-        if response.status_code == 200:
-            st.success("MCQs generated successfully!")
-            return response.json()  # Return the result from the FastAPI response (e.g., file location)
-        else:
-            st.error(f"Error generating MCQs: {response.json().get('message', 'Unknown error')}")
-            return None
+        with requests.post(FASTAPI_STREAM_MCQS_URL, stream=True, timeout=(10, None)) as response:
+            if response.status_code != 200:
+                st.error(f"Error generating MCQs: {response.text}")
+                return None
+            for event, data in iter_sse_events(response):
+                if event == "progress":
+                    fraction = data.get("progress")
+                    progress_bar.progress(fraction if fraction is not None else 0.0,
+                                          text=f"Stage: {data['stage']}")
+                elif event == "mcq":
+                    questions.append(data)
+                    preview.write(f"**Q{len(questions)}.** {data['question']}")
+                elif event == "error":
+                    st.error(f"Error generating MCQs: {data.get('message', 'Unknown error')}")
+                    return None
+                elif event == "done":
+                    progress_bar.progress(1.0, text="Done")
+                    if data.get("shortfall"):
+                        st.warning(data["message"])
+                    break
     except Exception as e:
         st.error(f"An error occurred while generating MCQs: {e}")
         return None
+    return {"mcqs": questions}
 
 # Main Streamlit app
 def mcq_bot():
@@ -72,14 +104,17 @@ def mcq_bot():
     generate_button = st.button("Generate Questions")
 
     if generate_button:
-        # Show a processing indicator
-        with st.spinner("Generating MCQs... This might take a few moments."):
-            # Generate MCQs by calling FastAPI
-            result = generate_mcqs()
+        # Questions appear one by one while the backend is still generating
+        result = stream_mcqs()
 
         if result:
             st.success("MCQs are ready!")
-            show_mcqs(result)
+            # Keep the questions across reruns triggered by answering them
+            st.session_state["mcq_result"] = result
+            st.rerun()
+
+    if st.session_state.get("mcq_result"):
+        show_mcqs(st.session_state["mcq_result"])
 
 # Show the MCQs once they are ready
 def show_mcqs(result):
@@ -88,6 +123,7 @@ def show_mcqs(result):
     if questions:
         user_answers = []
         descriptions = []  # To store descriptions for each question
+        sources = []  # Where each question comes from in the PDFs
 
         # Loop through each question
         for idx, question_data in enumerate(questions):
@@ -97,6 +133,7 @@ def show_mcqs(result):
             correct_answer = question_data["correct_answer"]
 
             descriptions.append(description)
+            sources.append(question_data.get("source"))
 
             # Display the question
             st.write(f"### {question}")
@@ -129,6 +166,11 @@ def show_mcqs(result):
             for idx, res in enumerate(results):
                 st.write(res)
                 st.write(f"**Description:** {descriptions[idx]}")
+                source = sources[idx]
+                if source and source.get("page_start"):
+                    pages = (f"page {source['page_start']}" if source["page_start"] == source["page_end"]
+                             else f"pages {source['page_start']}-{source['page_end']}")
+                    st.write(f"**Source:** {source['file']}, {pages}")
 
 # Run the app
 if __name__ == "__main__":